@@ -5,7 +5,6 @@ from discord.ext import commands
 from discord.utils import get
 from discord.ext.tasks import loop
 from discord.ext.commands import CommandNotFound
-from asteval import Interpreter
 from ISStreamer.Streamer import Streamer
 from datetime import datetime
 from copy import deepcopy
@@ -34,6 +33,9 @@ from _cogs.Conditions import ConditionLookupCog
 from _cogs.Stats import StatsCog
 from _cogs.Developer import DeveloperCog
 
+from _dice.ExpressionCache import expression_cache
+from _dice import Engine
+
 import discord
 import asyncio
 import sys
@@ -82,7 +84,6 @@ async def codify(string, title = None):
 #Initalize the bot:
 
 data = BotData()
-aeval = Interpreter()
 
 bot = commands.AutoShardedBot(command_prefix = get_pre)
 bot.remove_command('help')
@@ -350,6 +351,11 @@ async def save_to_disk():
     with open(absRelPath, 'w') as file:
         file.write(dumps(list(data.userSet)))
 
+    relPath = "_data//inline.txt"
+    absRelPath = path.join(pyDir, relPath)
+    with open(absRelPath, 'w') as file:
+        file.write(dumps(list(data.inlineSet)))
+
     pyDir = path.dirname(__file__)
     relPath = "_data//gms.txt"
     absRelPath = path.join(pyDir, relPath)
@@ -409,6 +415,7 @@ async def send_data():
     stream_data['user_count'] = len(data.userSet)
     stream_data['server_count'] = len(bot.guilds)
     stream_data['total_command_count'] = await bot.cogs.get('StatsCog').get_total_helper(data.statsDict)
+    stream_data['roll_cache_hit_rate'] = expression_cache.hit_rate()
 
     streamer = Streamer(bucket_name="Feyre", bucket_key=bucket_key, access_key=access_key, buffer_size=200)
     streamer.log_object(stream_data)
@@ -419,14 +426,10 @@ async def send_data():
 @bot.event
 async def on_command_error(ctx, error):
     if isinstance(error, CommandNotFound):
-        result = None
         try:
-            if((ctx.invoked_with[0] == 'r' and 'd' in ctx.invoked_with)): # Treat this as some attempted dice input
-                result = await bot.get_cog('DiceRoller').dice_roll.parse(ctx.invoked_with[0:], gm = False)
-            elif((ctx.invoked_with[0] == 'd' or ctx.invoked_with[1] == 'd' or ctx.invoked_with[2] == 'd')): # Treat this as some attempted dice input
-                result = await bot.get_cog('DiceRoller').dice_roll.parse(ctx.invoked_with[0:], gm = False)
-            if(result and not result.startswith("```I'm sorry")): # this is bad but ill accept it for now
-                await bot.get_cog('DiceRoller').roll(ctx, args = ctx.invoked_with[0:])
+            expression = Engine.dirty_roll(ctx.invoked_with) # Regex first, so most unknown commands are never parsed
+            if expression:
+                await bot.get_cog('DiceRoller').roll(ctx, args = expression)
                 data.statsDict['dirty_rolls'] += 1
                 return
         except Exception as e:
@@ -42,7 +42,16 @@ class StatsManager:
             "!vote",
             "!condition",
             "!bank",
-            "dirty_rolls"
+            "dirty_rolls",
+            "!odds",
+            "!sim",
+            "!inline",
+            "inline_rolls",
+            "!roll verify",
+            "!history",
+            "!dpr",
+            "!macro",
+            "!m"
         ]
 
     async def dump_stats_dict(self, stats_dict):
@@ -19,6 +19,8 @@ from _classes.BookOfTor import BookOfTor
 from _classes.Weapons import Weapons
 # from _classes.Class_Abilities import Class_Abil
 from _classes.Items import ItemLookup
+from _classes.RollHistory import RollHistory
+from _classes.Macros import MacroStore
 # from _classes.DeckOfMany import DeckOfMany
 # from _classes.ClassFeatures import ClassFeatures
 # from _classes.CurrencyConversion import CurrencyConverter
@@ -53,7 +55,6 @@ class BotData():
         Bot should support DM's
         GM/Secret rolls
         Only admin's should be able to change the bot's prefix
-        Inline dice rolls
         Fix dice roller (freezes on !roll 1000d20
     """
     def __init__(self):
@@ -87,12 +88,14 @@ class BotData():
         # self.initDict = {}
         # self.initEmbedDict = {}
 
-        self.roll_dict = {}
+        self.roll_dict = RollHistory() # Recent rolls of each channel for !history
+        self.macros = MacroStore() # Saved !macro rolls, each user's are loaded on first use
 
         self.gmDict = {}
 
         self.statsDict = {}
         self.prefixDict = {}
+        self.inlineSet = set() # Channels with inline [[1d20]] rolls turned on
 
         self.embedcolor = discord.Color.from_rgb(165,87,249)
 
@@ -194,6 +197,17 @@ class BotData():
             except Exception as e:
                 print(f"Error loading prefixes: {e}")
 
+        try:
+            print("Loading inline roll channels from disk...")
+            pyDir = path.dirname(__file__)
+            relPath = "..//_data//inline.txt"
+            absRelPath = path.join(pyDir, relPath)
+            self.inlineSet = set(load(open(absRelPath)))
+            print("Inline roll channels loaded succesfully")
+
+        except Exception as e:
+            print(f"Error loading inline roll channels: {e}")
+
         print("\nTime: " + str(datetime.now()))
 
     async def string_splitter(self, string, char, max_splits):
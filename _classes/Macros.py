@@ -0,0 +1,146 @@
+import os
+import re
+from os import path
+from json import load, dumps
+from collections import OrderedDict
+
+from _dice.Engine import read_flags, check_limits
+from _dice.Tokenizer import DiceParseError, normalize
+from _dice.Parser import compile_expression
+
+MACRO_DIR = path.join(path.dirname(__file__), '..', '_data', 'macros')
+MAX_MACROS = 50 # Macros saved per user
+MAX_LENGTH = 200 # Longest macro expression
+_NAME_RE = re.compile(r"[a-z0-9_-]{1,32}")
+
+class Macro:
+    """
+    A saved roll, compiled once so invoking it never tokenizes or validates the expression again
+
+    Attributes:
+        text -- the expression as it was saved, including flags, Ex: -a 1d20+7
+        advantage, disadvantage -- flags read from the text
+        expression -- the CompiledExpression
+    """
+    __slots__ = ('text', 'advantage', 'disadvantage', 'expression')
+
+    def __init__(self, text):
+        self.text = text
+        self.advantage, self.disadvantage, inp = read_flags(text)
+        self.expression = compile_expression(normalize(inp))
+        limit = check_limits(self.expression)
+        if limit:
+            raise DiceParseError(self.expression.expression, "Expression too large", limit)
+
+class MacroStore:
+    """
+    Saved roll macros of every user. Each user's macros are one small JSON file of name -> text,
+    read the first time the user saves or invokes a macro and written whenever they change.
+
+    Compiled macros are kept in a bounded LRU keyed by (user, name), so a macro that has not been
+    used in a while is compiled again from its text the next time.
+
+    Attributes:
+        directory -- folder the macro files are kept in
+        maxusers -- users whose macro texts are kept in memory
+        maxcompiled -- compiled macros kept
+    """
+    def __init__(self, directory = MACRO_DIR, maxusers = 1000, maxcompiled = 2048):
+        self.directory = directory
+        self.maxusers = maxusers
+        self.maxcompiled = maxcompiled
+        self.users = OrderedDict()
+        self.compiled = OrderedDict()
+
+    def file_path(self, user_id):
+        return path.join(self.directory, f"{int(user_id)}.json")
+
+    def macros(self, user_id):
+        """
+        Returns the name -> text dictionary of a user, loading it from disk the first time
+        """
+        macros = self.users.get(user_id)
+        if macros is None:
+            try:
+                with open(self.file_path(user_id)) as file:
+                    macros = load(file)
+            except (OSError, ValueError):
+                macros = {}
+            self.users[user_id] = macros
+            while len(self.users) > self.maxusers: # Already on disk, it is read again if needed
+                self.users.popitem(last = False)
+        self.users.move_to_end(user_id)
+        return macros
+
+    def write(self, user_id):
+        """
+        Writes a user's macros, replacing the old file only once the new one is complete
+        """
+        os.makedirs(self.directory, exist_ok = True)
+        filename = self.file_path(user_id)
+        with open(filename + '.tmp', 'w') as file:
+            file.write(dumps(self.macros(user_id), separators = (',', ':')))
+        os.replace(filename + '.tmp', filename)
+
+    def remember(self, user_id, name, macro):
+        self.compiled[(user_id, name)] = macro
+        self.compiled.move_to_end((user_id, name))
+        while len(self.compiled) > self.maxcompiled:
+            self.compiled.popitem(last = False)
+
+    def save(self, user_id, name, text):
+        """
+        Compiles and saves a macro, replacing any macro with the same name
+
+        Raises:
+            DiceParseError if the name or expression is not valid
+        """
+        name = name.lower()
+        text = ' '.join(text.split())
+        if not _NAME_RE.fullmatch(name):
+            raise DiceParseError(name, "Invalid macro name", "Macro names can only use letters, numbers, - and _ and be at most 32 characters long.")
+        if len(text) > MAX_LENGTH:
+            raise DiceParseError(text, "Macro too long", f"Macros can be at most {MAX_LENGTH} characters long.")
+
+        macros = self.macros(user_id)
+        if name not in macros and len(macros) >= MAX_MACROS:
+            raise DiceParseError(name, "Too many macros", f"You can save at most {MAX_MACROS} macros, delete one first.")
+
+        macro = Macro(text)
+        macros[name] = text
+        self.remember(user_id, name, macro)
+        self.write(user_id)
+        return macro
+
+    def get(self, user_id, name):
+        """
+        Returns the compiled Macro, or None if the user has no macro with that name
+
+        Raises:
+            DiceParseError if the saved text is no longer valid, such as after the limits changed
+        """
+        name = name.lower()
+        macro = self.compiled.get((user_id, name))
+        if macro is not None:
+            self.compiled.move_to_end((user_id, name))
+            return macro
+
+        text = self.macros(user_id).get(name)
+        if text is None:
+            return None
+        macro = Macro(text) # Compiled again after it was evicted, the limits may have changed since it was saved
+        self.remember(user_id, name, macro)
+        return macro
+
+    def delete(self, user_id, name):
+        """
+        Deletes a macro, returns False if there was no macro with that name
+        """
+        name = name.lower()
+        macros = self.macros(user_id)
+        if name not in macros:
+            return False
+        del macros[name]
+        self.compiled.pop((user_id, name), None)
+        self.write(user_id)
+        return True
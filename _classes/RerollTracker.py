@@ -0,0 +1,82 @@
+import time
+from collections import OrderedDict
+
+class Reroll:
+    """
+    A roll message that can be rerolled with the reroll emoji
+
+    Attributes:
+        args: the dice expression that was rolled
+        channel_id: channel the message was sent in
+        private: True if the message is in a DM, DM messages are resent instead of edited
+        expires: time.monotonic() after which the message can no longer be rerolled
+    """
+    __slots__ = ('args', 'channel_id', 'private', 'expires')
+
+    def __init__(self, args, channel_id, private, expires):
+        self.args = args
+        self.channel_id = channel_id
+        self.private = private
+        self.expires = expires
+
+class RerollTracker:
+    """
+    Roll messages that can be rerolled, keyed by message id.
+
+    Every message gets the same time to live, so insertion order is also expiry order and
+    expired or excess messages are always at the front.
+
+    Attributes:
+        ttl: seconds a message can be rerolled for
+        maxsize: maximum number of messages tracked, the oldest are dropped first
+    """
+    def __init__(self, ttl = 21600, maxsize = 10000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.rolls = OrderedDict()
+
+    def __len__(self):
+        return len(self.rolls)
+
+    def add(self, message_id, args, channel_id, private):
+        """
+        Starts tracking a message. Returns a list of (message id, Reroll) that were dropped to make room.
+        """
+        self.rolls[message_id] = Reroll(args, channel_id, private, time.monotonic() + self.ttl)
+        dropped = []
+        while len(self.rolls) > self.maxsize:
+            dropped.append(self.rolls.popitem(last = False))
+        return dropped
+
+    def get(self, message_id):
+        """
+        Returns the Reroll for a message, or None if it is not tracked or has expired
+        """
+        roll = self.rolls.get(message_id)
+        if roll is None or roll.expires < time.monotonic():
+            return None
+        return roll
+
+    def refresh(self, message_id, new_message_id = None):
+        """
+        Restarts the time to live of a message after a reroll. DM rolls are resent, so they are
+        tracked under new_message_id from then on.
+        """
+        roll = self.rolls.pop(message_id, None)
+        if roll is not None:
+            roll.expires = time.monotonic() + self.ttl
+            self.rolls[new_message_id or message_id] = roll # Back of the queue, the order stays sorted by expiry
+        return roll
+
+    def expire(self):
+        """
+        Stops tracking expired messages and returns them as a list of (message id, Reroll)
+        """
+        now = time.monotonic()
+        expired = []
+        while self.rolls:
+            message_id, roll = next(iter(self.rolls.items()))
+            if roll.expires >= now:
+                break
+            expired.append(self.rolls.popitem(last = False))
+        return expired
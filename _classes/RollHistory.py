@@ -0,0 +1,137 @@
+import numpy as np
+from collections import OrderedDict
+
+# One row per roll. natural is the d20 of rolls like 1d20+5, 0 if the roll had no single d20.
+ROLL_DTYPE = np.dtype([
+    ('user', np.uint64),
+    ('expression', np.uint64),
+    ('total', np.float64),
+    ('natural', np.uint8),
+    ('check', np.bool_),
+])
+
+def longest_run(mask):
+    """
+    Length of the longest run of True in a boolean array
+    """
+    if not mask.any():
+        return 0
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return int((np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)).max())
+
+class ChannelHistory:
+    """
+    Fixed size ring buffer of the latest rolls in a channel, stored in one NumPy array so
+    statistics are reductions over columns instead of loops over messages.
+
+    Attributes:
+        rolls: structured array of ROLL_DTYPE, capacity rows
+        pos: index the next roll is written to
+        count: number of rows in use
+    """
+    def __init__(self, capacity):
+        self.rolls = np.zeros(capacity, dtype=ROLL_DTYPE)
+        self.pos = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def add(self, user, expression, total, natural, check):
+        self.rolls[self.pos] = (user, expression, total, natural, check)
+        self.pos = (self.pos + 1) % len(self.rolls)
+        self.count = min(self.count + 1, len(self.rolls))
+
+    def ordered(self):
+        """
+        Returns the rolls in use from oldest to newest
+        """
+        if self.count < len(self.rolls):
+            return self.rolls[:self.count]
+        return np.concatenate((self.rolls[self.pos:], self.rolls[:self.pos]))
+
+    def stats(self, user = None):
+        """
+        Statistics of every roll in the channel, or of one user's rolls
+        """
+        rolls = self.ordered()
+        if user is not None:
+            rolls = rolls[rolls['user'] == user]
+
+        totals = rolls['total'][~rolls['check']]
+        checks = rolls['total'][rolls['check']]
+        naturals = rolls['natural'][rolls['natural'] > 0]
+        return {
+            'rolls': len(rolls),
+            'average': float(totals.mean()) if len(totals) else None,
+            'checks': len(checks),
+            'passed': float(checks.mean()) if len(checks) else None,
+            'd20s': len(naturals),
+            'nat20': float(np.mean(naturals == 20)) if len(naturals) else None,
+            'nat1': float(np.mean(naturals == 1)) if len(naturals) else None,
+            'average_d20': float(naturals.mean()) if len(naturals) else None,
+            'hot_streak': longest_run(naturals >= 11), # Most d20s in a row in the top half
+            'cold_streak': longest_run(naturals <= 10),
+        }
+
+    def users(self):
+        """
+        Users with rolls in the channel, ordered by number of rolls
+        """
+        users, counts = np.unique(self.ordered()['user'], return_counts = True)
+        return [int(u) for u in users[np.argsort(-counts, kind = 'stable')]]
+
+class RollHistory:
+    """
+    Roll history of the most recently active channels. A channel that has not rolled in a while
+    is evicted once more than maxchannels channels have rolled.
+
+    Expressions are stored as their hash, the text of recent expressions is kept in a bounded
+    table so the history can show them.
+
+    Attributes:
+        capacity: rolls kept per channel
+        maxchannels: channels kept
+        maxexpressions: expression texts kept
+    """
+    def __init__(self, capacity = 200, maxchannels = 2000, maxexpressions = 4096):
+        self.capacity = capacity
+        self.maxchannels = maxchannels
+        self.maxexpressions = maxexpressions
+        self.channels = OrderedDict()
+        self.expressions = OrderedDict()
+
+    def __len__(self):
+        return len(self.channels)
+
+    def add(self, channel_id, user, expression_hash, text, total, natural = 0):
+        """
+        Records a roll. Skill checks are stored with a total of 1 or 0.
+        """
+        try:
+            value = float(total)
+        except (OverflowError, TypeError): # Too large or complex, there is nothing useful to average
+            return
+
+        history = self.channels.get(channel_id)
+        if history is None:
+            history = self.channels[channel_id] = ChannelHistory(self.capacity)
+            while len(self.channels) > self.maxchannels:
+                self.channels.popitem(last = False)
+        self.channels.move_to_end(channel_id)
+
+        self.expressions[expression_hash] = text
+        self.expressions.move_to_end(expression_hash)
+        while len(self.expressions) > self.maxexpressions:
+            self.expressions.popitem(last = False)
+
+        history.add(user, expression_hash, value, natural, type(total) is bool)
+
+    def get(self, channel_id):
+        """
+        Returns the ChannelHistory of a channel, or None if nothing was rolled there recently
+        """
+        return self.channels.get(channel_id)
+
+    def text(self, expression_hash):
+        return self.expressions.get(int(expression_hash), "?")
@@ -9,6 +9,7 @@ from _backend.UserManager import UserManager
 from _backend.StatsManager import StatsManager
 from _backend.PrefixesManager import PrefixManager
 from _backend.GmManager import GmManager
+from _dice.ExpressionCache import expression_cache
 from copy import deepcopy
 
 class DeveloperCog(commands.Cog):
@@ -106,6 +107,12 @@ class DeveloperCog(commands.Cog):
             msg += "```"
             await ctx.send(msg)
 
+    @commands.command()
+    async def dice_cache(self, ctx):
+        if(ctx.author.id == 112041042894655488):
+            stats = expression_cache.stats()
+            await ctx.send("```Size: {} | Hits: {} | Misses: {} | Hit rate: {:.1%}```".format(stats['size'], stats['hits'], stats['misses'], stats['hit_rate']))
+
     @commands.command()
     async def ping(self, ctx):
         await ctx.send('```Pong! {0}ms```'.format(round(self.bot.latency, 3)))
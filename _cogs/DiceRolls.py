@@ -1,220 +1,33 @@
-import random
 import asyncio
 import re
-import copy
-import numpy as np
-import math
-from asteval import Interpreter
+import time
 import discord
 
-from discord.ext import commands
-
-aeval = Interpreter()
-
-#rolls dice
-#accepts input in the form of !roll #dTYPE ex: !roll 1d20 + 5
-class DiceRoll():
-    async def parse(self, inp, gm = False, total_only = False):
-        """
-        Parses a string of the format !roll #d# +,/,*,- #d# or # ... evaulated 
-        Ex: !roll 5d20 + 1d6 * 2
-        Returns an invalid input message if the input is not recongnized.
-        """
-        #try:
-            #TODO: Fix this spaget
-        advantage = False
-        disadvantage = False
-        inp = inp.lower().strip()
-        inp = inp.replace('\\','')
-        if(inp.startswith('-a')):
-            advantage = True
-            inp = inp.replace('-a', '').strip()
-
-        if(inp.startswith('-d')):
-            disadvantage = True
-            inp = inp.replace('-d', '').strip()
-
-        #check formatting
-        illegal = "abcefghijklmnopqrstuvwxyz!,[]|&"
-        inp = inp.replace(' ', '')
-        m = re.match(r"^((\d*)d(\d*)([-+*/><]?\d*))*", inp)
-    
-        #sanitize inp
-        sanitize = any(c in inp.lower() for c in illegal)
-
-        if(sanitize == True):
-            return "```I'm sorry, there was something I didnt understand about your input. See !help roll for more info```"
-
-        ms = re.split(r"([-+*/()><])", m.string)
-        ms = list(filter(None, ms)) #remove any empty strings that could cause issues
-        adv = copy.deepcopy(ms)
-
-        rollExp = copy.deepcopy(ms)
-
-        for i in range(0, len(ms)):
-            if (re.match(r"^((\d*)d(\d*))", ms[i])):
-                split = ms[i].split('d')
-                try:
-                    numDice = int(split[0])
-
-                except ValueError:
-                    numDice = int(1)
-
-                typeDice = int(split[1])
-
-                if(numDice > 100000):
-                    return "Your inp is too big! Maximum number of dice is 100,000"
-
-                if(typeDice > 9223372036854775808):
-                    return ("Your inp is too big! Maximum size is 9,223,372,036,854,775,807")
-
-
-                ms[i] = self.rollDice(numDice, typeDice)
-                if(advantage or disadvantage):
-                    adv[i] = self.rollDice(numDice, typeDice)
-       
-        unEval = copy.deepcopy(ms)
-        if(advantage or disadvantage):
-            unEvalAdv = copy.deepcopy(adv)
-            evalledAdv = adv
-
-        evalled = ms
-        
-        for i in range(0, len(ms)):
-            try:
-                evalled[i] = sum(ms[i])
-            except:
-                continue
-
-        if(advantage or disadvantage):
-            for i in range(0, len(adv)):
-                try:
-                    evalledAdv[i] = sum(adv[i])
-                except:
-                    continue
-            unEvalStrAdv = ''.join(str(e) for e in unEvalAdv)
-            evalStrAdv = ''.join(str(e) for e in evalledAdv)
-            totalAdv = aeval(evalStrAdv)
-            
-        unEvalStr = ''.join(str(e) for e in unEval)
-        evalStr = ''.join(str(e) for e in evalled)
-        rollExpStr = ''.join(str(e) for e in rollExp)
-        total = aeval(evalStr)
-
-        if total_only:
-            return total
-
-        if(advantage or disadvantage):
-            return self.constructReturnStringAdvantage(advantage, disadvantage, rollExpStr, unEvalStr, unEvalStrAdv, total, totalAdv)
-
-        if(not gm):
-            return self.constructReturnString(rollExpStr, unEvalStr, total)
-        if(gm and not advantage or not disadvantage):
-            return self.constructReturnStringNoFormat(rollExpStr, unEvalStr, total)
-        
-
-        #except Exception as e:
-            #return ("*I'm sorry, there was something I didnt understand about your inp.*\n" + str(e))
-
-    def constructReturnStringAdvantage(self, adv, disadv, rES, uES, uES2, t1, t2):
-        """
-        Constructs the return string where rES is the original expression, uES is the expression with all rolls, and t is the total
-        """
-        if(len(uES) > 100 or len(uES2) > 100):
-            uES = "Omitted (# of dice was too large)"
-
-        if(adv):
-            outMsg = f'''```diff
-I interpreted your input as {rES} with advantage.
-Totals: [{t1}] & [{t2}]
-- You rolled [{max(t1, t2)}] with advantage -```'''
-
-            return outMsg
-
-        elif(disadv):
-            outMsg = f'''```diff
-I interpreted your input as {rES} with disadvantage.
-Totals: [{t1}] & [{t2}]
-- You rolled [{min(t1, t2)}] with disadvantage -```'''
-
-            return outMsg
-
-    def constructReturnString(self,rES, uES, t):
-        """
-        Constructs the return string where rES is the original expression, uES is the expression with all rolls, and t is the total
-        """
-        if(len(uES) > 100):
-            uES = "Omitted (# of dice was too large)"
-
-        if(type(t) is bool):
-            if(t):
-                outMsg = f'''```diff
-I interpreted your input as {rES}.
-Rolls: {uES}
-- Ability/Skill Check: Succeeded -```'''
-            else:
-                outMsg = f'''```diff
-I interpreted your input as {rES}.
-Rolls: {uES}
-- Ability/Skill Check: Failed -```'''
-
-        elif float(t).is_integer():
-            outMsg = f'''```diff
-I interpreted your input as {rES}.
-Rolls: {uES}
-- Total: {t} -```'''
-
-        else:
-            outMsg = f'''```diff
-I interpreted your input as {rES}.
-Rolls: {uES}
-- Total: {"%.2f" % t} -```'''
-
-        return outMsg
-
-    def constructReturnStringNoFormat(self,rES, uES, t):
-        """
-        Constructs the return string where rES is the original expression, uES is the expression with all rolls, and t is the total
-        """
-        if(len(uES) > 100):
-            uES = "Omitted (# of dice was too large)"
-
-        if(type(t) is bool):
-            if(t):
-                outMsg = f'''I interpreted your input as {rES}.
-Rolls: {uES}
-[Ability/Skill Check: Succeeded]'''
-            else:
-                outMsg = f'''I interpreted your input as {rES}.
-Rolls: {uES}
-[Ability/Skill Check: Failed]'''
-
-        elif float(t).is_integer():
-            outMsg = f'''
-I interpreted your input as {rES}.
-Rolls: {uES}
-- Total: {t} -'''
-
-        else:
-            outMsg = f'''
-I interpreted your input as {rES}.
-Rolls: {uES}
-- Total: {"%.2f" % t} -'''
-
-        return outMsg
-
-    def rollDice(self, numDice, typeDice):
-        """
-        Rolls a number of dice (numDice) of type (typeDice) and returns the rolls as a list.
-        """
-        rolls = np.random.randint(1,typeDice+1,numDice, dtype=np.int64)     
-        return list(rolls)
+from collections import OrderedDict
+from discord.ext import commands, tasks
+from _dice import Engine, Damage
+from _dice.Simulation import Simulation, DEFAULT_TRIALS
+from _dice.Tokenizer import DiceParseError
+from _dice.Renderer import format_total
+from _classes.RerollTracker import RerollTracker
+
+SIM_TIME_LIMIT = 30 # Seconds a simulation can run before it is stopped
+SIM_EDIT_INTERVAL = 1 # Seconds between progress edits, keeps the bot under the edit rate limit
+HISTORY_ROLLS = 10 # Rolls shown by !history
+HISTORY_PLAYERS = 5 # Players with statistics shown by !history
+GM_DM_TIMEOUT = 5 # Seconds a !gm roll DM can take before it is reported as failed
+MAX_DM_CHANNELS = 5000 # DMChannels cached for !gm roll
 
 class DiceRoller(commands.Cog):
     def __init__(self, bot, data):
         self.bot = bot
         self.data = data
-        self.dice_roll = DiceRoll()
+        self.rerolls = RerollTracker()
+        self.dm_channels = OrderedDict() # (channel id, user id) -> DMChannel for !gm roll
+        self.expire_rerolls.start()
+
+    def cog_unload(self):
+        self.expire_rerolls.cancel()
 
     @commands.command(aliases = ['Gm'])
     async def gm(self, ctx, *, args = None):
@@ -232,23 +45,64 @@ class DiceRoller(commands.Cog):
         elif (args != None):
             args = args.strip()
             if (args.startswith('roll')):
-                try:
-                    expression = args.replace('roll', '').strip()
-                    result = await self.dice_roll.parse(expression, gm = True)
+                # Saved GMs loaded from disk have string keys
+                gm_id = self.data.gmDict.get(ctx.channel.id, self.data.gmDict.get(str(ctx.channel.id)))
+                if gm_id is None:
+                    await ctx.send("```This channel does not have a dedicated GM. Type !gm to set yourself as GM.```")
+                    return
+
+                expression = args.replace('roll', '').strip()
+                # Not audited, the roll log would show the secret total to anyone in the channel
+                result = await Engine.roll_async(expression, gm = True)
 
-                    gmUser = self.bot.get_user(self.data.gmDict[ctx.channel.id])
-                    gmResult = f'''```diff
+                gmResult = f'''```diff
     Roll from [{ctx.author.name}]
     {result} ```'''
+                userResult = f'''```diff
+    {result}```'''
 
-                    await gmUser.send(gmResult)
+                # Both DMs go out at once, a slow or failed DM never holds up the other
+                sent = await asyncio.gather(self.send_dm(ctx.channel.id, int(gm_id), gmResult),
+                                            self.send_dm(ctx.channel.id, ctx.author.id, userResult))
+                errors = [f"I couldn't send the roll to {'the GM' if i == 0 else 'you'}, {error}" for i, error in enumerate(sent) if error]
+                if errors:
+                    newline = '\n'
+                    await ctx.send(f'''```{newline.join(errors)}```''')
 
-                    userResult = f'''```diff
-    {result}```'''
-                    sendUser = self.bot.get_user(ctx.author.id)
-                    await sendUser.send(userResult)
-                except:
-                    await ctx.send("```This channel does not have a dedicated GM. Type !gm to set yourself as GM.```")
+    async def dm_channel(self, channel_id, user_id):
+        """
+        Returns the DMChannel of a user, resolved once per (channel, user) and then cached
+        """
+        key = (channel_id, user_id)
+        channel = self.dm_channels.get(key)
+        if channel is None:
+            user = self.bot.get_user(user_id) or await self.bot.fetch_user(user_id)
+            channel = user.dm_channel or await user.create_dm()
+            self.dm_channels[key] = channel
+            while len(self.dm_channels) > MAX_DM_CHANNELS:
+                self.dm_channels.popitem(last = False)
+        self.dm_channels.move_to_end(key)
+        return channel
+
+    async def send_dm(self, channel_id, user_id, content):
+        """
+        Sends a DM within GM_DM_TIMEOUT seconds, returns None if it was sent or the reason it wasn't
+        """
+        try:
+            channel = await asyncio.wait_for(self.dm_channel(channel_id, user_id), GM_DM_TIMEOUT)
+            await asyncio.wait_for(channel.send(content), GM_DM_TIMEOUT)
+            return None
+        except asyncio.TimeoutError:
+            return "Discord took too long to respond, try again."
+        except discord.NotFound:
+            self.dm_channels.pop((channel_id, user_id), None)
+            return "the user could not be found."
+        except discord.Forbidden:
+            self.dm_channels.pop((channel_id, user_id), None)
+            return "direct messages are closed to this bot. Allow direct messages from server members to receive GM rolls."
+        except discord.HTTPException as e:
+            self.dm_channels.pop((channel_id, user_id), None)
+            return f"Discord returned an error ({e.status})."
 
     @commands.command(aliases = ['Roll', 'r', 'R'])
     async def roll(self, ctx, *, args = None):
@@ -264,42 +118,343 @@ class DiceRoller(commands.Cog):
             await ctx.send('''```Missing command arguments, see !help roll for more information.\nEx: !roll 1d20+5```''')
             return
 
-        roll_msg = await self.dice_roll.parse(args, gm = False)
+        if args.strip().lower().startswith('-dist'): # Odds instead of a roll, there is nothing to reroll
+            await ctx.send(await Engine.odds_async(args.strip()[5:]))
+            return
+
+        m = re.match(r"\s*verify\s+(\d+)\s*(.*)", args, re.IGNORECASE | re.DOTALL)
+        if m: # Checks an earlier roll against the audit log
+            self.data.statsDict['!roll verify'] += 1
+            await ctx.send(await Engine.verify_async(int(m.group(1)), ctx.channel.id, m.group(2)))
+            return
+
+        roll_msg = await Engine.roll_async(args, channel = ctx.channel.id, history = (self.data.roll_dict, ctx.author.id))
         msg = await ctx.send(roll_msg)
 
-        # Add emoji to roll
+        # Add emoji to roll, reactions are handled by on_raw_reaction_add
         arrows = '🔁'
         await msg.add_reaction(arrows)
-        await self.reroll_helper(ctx, args, roll_msg, msg)
+        for message_id, reroll in self.rerolls.add(msg.id, args, ctx.channel.id, ctx.channel.type is discord.ChannelType.private):
+            await self.clear_reroll(message_id, reroll)
         
 
-    async def reroll_helper(self, ctx, args, roll_msg, msg):
+    @commands.command(aliases = ['Odds'])
+    async def odds(self, ctx, *, args = None):
+        """
+        Calculates the exact odds of any dice expression, including skill checks
+            Ex: !odds 2d20k1+5>=15
+        """
+        self.data.userSet.add(ctx.author.id)
+        self.data.statsDict['!odds'] += 1
+
+        if not args:
+            await ctx.send('''```Missing command arguments, see !help odds for more information.\nEx: !odds 1d20+5>=15```''')
+            return
+
+        await ctx.send(await Engine.odds_async(args))
+
+    @commands.command(aliases = ['Sim'])
+    async def sim(self, ctx, *, args = None):
+        """
+        Simulates a dice expression, including then and count statements, and shows the results as they come in
+            Ex: !sim 1d20+5>15 then 2d6+3 count 3 n=100000
+        """
+        self.data.userSet.add(ctx.author.id)
+        self.data.statsDict['!sim'] += 1
+
+        if not args:
+            await ctx.send('''```Missing command arguments, see !help sim for more information.\nEx: !sim 4d6k3 n=100000```''')
+            return
+
+        trials = DEFAULT_TRIALS
+        m = re.search(r"\bn\s*=\s*([\d,_]+)", args)
+        if m:
+            trials = int(m.group(1).replace(',', '').replace('_', '') or 0)
+            args = args[:m.start()] + args[m.end():]
+
         try:
-            reaction, u = await self.bot.wait_for('reaction_add', check=lambda r, u:str(r.emoji) == '🔁' and u.id != self.bot.user.id and r.message.id == msg.id, timeout=21600) # Times out after 6 hours
-
-            if reaction != None:
-                self.data.statsDict['rerolls'] += 1
-                roll_msg = await self.dice_roll.parse(args, gm = False)
-                if ctx.channel.type is discord.ChannelType.private:
-                    await msg.delete()
-                    msg = await ctx.send(roll_msg)
-                    await msg.add_reaction('🔁')
-                else:
-                    await msg.edit(content=roll_msg)
-                    await reaction.remove(u)
-                await self.reroll_helper(ctx, args, roll_msg, msg)
-        
-        except Exception as e:
-            if type(e) is asyncio.TimeoutError:
-                if ctx.channel.type is discord.ChannelType.private:
-                        contents = msg.content
-                        await msg.delete()
-                        await ctx.send(contents)
-                else:
-                    await msg.clear_reaction('🔁')
-
-            elif type(e) is discord.errors.Forbidden:
+            if trials < 1:
+                raise DiceParseError(args, "Invalid number of trials", "The number of trials must be at least 1.")
+            sim = Simulation(args, trials)
+        except DiceParseError as e:
+            await ctx.send(f"```I'm sorry, I couldn't simulate that expression. {e.message} See !help sim for more info```")
+            return
+
+        msg = await ctx.send(sim.report())
+        loop = asyncio.get_running_loop()
+        start = last_edit = time.monotonic()
+        stopped = None
+        try:
+            while not sim.finished():
+                if time.monotonic() - start > SIM_TIME_LIMIT:
+                    stopped = "stopped after the time limit"
+                    break
+                await loop.run_in_executor(None, sim.step) # Chunks run in a thread, the bot keeps responding
+                if time.monotonic() - last_edit >= SIM_EDIT_INTERVAL and not sim.finished():
+                    await msg.edit(content=sim.report())
+                    last_edit = time.monotonic()
+        except (ZeroDivisionError, OverflowError, ValueError, DiceParseError):
+            stopped = "stopped, a roll could not be calculated"
+        except MemoryError:
+            stopped = "stopped, the rolls did not fit in memory"
+
+        await msg.edit(content=sim.report(stopped))
+
+    @commands.command(aliases = ['Macro', 'macros', 'Macros'])
+    async def macro(self, ctx, *, args = None):
+        """
+        Saves, lists and deletes roll macros
+            Ex: !macro save attack -a 1d20+7
+        """
+        self.data.userSet.add(ctx.author.id)
+        self.data.statsDict['!macro'] += 1
+
+        parts = (args or '').split(maxsplit = 2)
+        action = parts[0].lower() if parts else 'list'
+
+        if action == 'save':
+            if len(parts) < 3:
+                await ctx.send('''```Missing command arguments, see !help macro for more information.\nEx: !macro save attack 1d20+7```''')
+                return
+            try:
+                macro = self.data.macros.save(ctx.author.id, parts[1], parts[2])
+            except DiceParseError as e:
+                await ctx.send(f"```I'm sorry, I couldn't save that macro. {e.message} See !help macro for more info```")
+                return
+            await ctx.send(f"```Saved {parts[1].lower()} as {macro.text}. Roll it with !m {parts[1].lower()}```")
+
+        elif action == 'delete':
+            if len(parts) < 2:
+                await ctx.send('''```Missing command arguments, see !help macro for more information.\nEx: !macro delete attack```''')
+            elif self.data.macros.delete(ctx.author.id, parts[1]):
+                await ctx.send(f"```Deleted {parts[1].lower()}.```")
+            else:
+                await ctx.send(f"```You don't have a macro called {parts[1].lower()}.```")
+
+        elif action == 'list':
+            macros = self.data.macros.macros(ctx.author.id)
+            if not macros:
+                await ctx.send("```You don't have any macros. Save one with !macro save <name> <expression>```")
+                return
+            newline = '\n'
+            await ctx.send(f'''```Your macros:
+{newline.join(f"{name}: {text}" for name, text in sorted(macros.items()))}```''')
+
+        else: # !macro <name> rolls it, the same as !m
+            await self.roll_macro(ctx, action)
+
+    @commands.command(aliases = ['M'])
+    async def m(self, ctx, *, args = None):
+        """
+        Rolls a saved macro
+            Ex: !m attack
+        """
+        self.data.userSet.add(ctx.author.id)
+        self.data.statsDict['!m'] += 1
+
+        if not args:
+            await ctx.send('''```Missing command arguments, see !help macro for more information.\nEx: !m attack```''')
+            return
+        await self.roll_macro(ctx, args.strip())
+
+    async def roll_macro(self, ctx, name):
+        try:
+            macro = self.data.macros.get(ctx.author.id, name)
+        except DiceParseError as e:
+            await ctx.send(f"```I'm sorry, your macro {name.lower()} is no longer valid. {e.message} Save it again with !macro save```")
+            return
+        if macro is None:
+            await ctx.send(f"```You don't have a macro called {name.lower()}. See your macros with !macro list```")
+            return
+
+        roll_msg = await Engine.roll_compiled_async(macro.expression, macro.advantage, macro.disadvantage,
+                                                    channel = ctx.channel.id, history = (self.data.roll_dict, ctx.author.id))
+        msg = await ctx.send(roll_msg)
+
+        await msg.add_reaction('🔁') # Rerolls roll the saved text, the same as !roll
+        for message_id, reroll in self.rerolls.add(msg.id, macro.text, ctx.channel.id, ctx.channel.type is discord.ChannelType.private):
+            await self.clear_reroll(message_id, reroll)
+
+    @commands.command(aliases = ['Dpr', 'DPR'])
+    async def dpr(self, ctx, *, args = None):
+        """
+        Calculates the expected damage per round of an attack against one or a range of armor classes
+            Ex: !dpr longsword+3 +7 vs AC 12-18 adv x2
+        """
+        self.data.userSet.add(ctx.author.id)
+        self.data.statsDict['!dpr'] += 1
+
+        if not args:
+            await ctx.send('''```Missing command arguments, see !help dpr for more information.\nEx: !dpr longsword+3 +5 vs AC 15```''')
+            return
+
+        try:
+            request = Damage.parse_request(args)
+            weapon = None
+            split = Damage.weapon_name(request.damage)
+            if split:
+                weapon = await self.data.weapons.search(split[0].title())
+                if not weapon:
+                    await ctx.send("```Sorry, I couldn't find that weapon.```")
+                    return
+            expression = Damage.damage_expression(request.damage, weapon)
+        except DiceParseError as e:
+            await ctx.send(f"```I'm sorry, I couldn't calculate that attack. {e.message} See !help dpr for more info```")
+            return
+
+        label = f"{weapon.name} ({expression})" if weapon else expression
+        loop = asyncio.get_running_loop()
+        await ctx.send(await loop.run_in_executor(None, Damage.dpr, request, expression, label)) # A simulation can take a moment
+
+    @commands.command(aliases = ['History'])
+    async def history(self, ctx, *, args = None):
+        """
+        Shows the latest rolls in this channel and statistics for each player
+            Ex: !history
+                !history me
+        """
+        self.data.userSet.add(ctx.author.id)
+        self.data.statsDict['!history'] += 1
+
+        history = self.data.roll_dict.get(ctx.channel.id)
+        if history is None or not len(history):
+            await ctx.send("```Nothing has been rolled in this channel recently.```")
+            return
+
+        me = (args or '').strip().lower() == 'me'
+        rolls = history.ordered()
+        if me:
+            rolls = rolls[rolls['user'] == ctx.author.id]
+            if not len(rolls):
+                await ctx.send("```You haven't rolled in this channel recently.```")
+                return
+
+        lines = []
+        for roll in rolls[-HISTORY_ROLLS:][::-1]:
+            total = ('Succeeded' if roll['total'] else 'Failed') if roll['check'] else format_total(roll['total'])
+            name = "" if me else f"{self.user_name(ctx, int(roll['user']))}: "
+            lines.append(f"{name}{self.data.roll_dict.text(roll['expression'])} = {total}")
+
+        users = [ctx.author.id] if me else history.users()[:HISTORY_PLAYERS]
+        stats = [self.stats_line(self.user_name(ctx, user), history.stats(user)) for user in users]
+
+        newline = '\n'
+        title = "Your latest rolls" if me else "Latest rolls"
+        await ctx.send(f'''```diff
+{title} in this channel:
+{newline.join(lines)}
+
+Statistics:
+{newline.join(stats)}```''')
+
+    def user_name(self, ctx, user_id):
+        member = ctx.guild.get_member(user_id) if ctx.guild else None
+        user = member or self.bot.get_user(user_id)
+        return user.display_name if user else str(user_id)
+
+    def stats_line(self, name, stats):
+        line = f"{name}: {stats['rolls']} rolls"
+        if stats['average'] is not None:
+            line += f", average {stats['average']:.2f}"
+        if stats['passed'] is not None:
+            line += f", {100 * stats['passed']:.0f}% of {stats['checks']} checks passed"
+        if stats['d20s']:
+            line += f", {stats['d20s']} d20s averaging {stats['average_d20']:.2f} with {100 * stats['nat20']:.0f}% nat 20s and {100 * stats['nat1']:.0f}% nat 1s"
+            line += f", longest streak {stats['hot_streak']} high / {stats['cold_streak']} low"
+        return line
+
+    @commands.command(aliases = ['Inline'])
+    async def inline(self, ctx, *, args = None):
+        """
+        Turns inline rolls on or off for a channel, then [[1d20+5]] anywhere in a message is rolled
+            Ex: !inline on
+        """
+        self.data.userSet.add(ctx.author.id)
+        self.data.statsDict['!inline'] += 1
+
+        if ctx.guild != None and not ctx.author.guild_permissions.manage_channels:
+            await ctx.send("```Only members who can manage channels can turn inline rolls on or off.```")
+            return
+
+        args = (args or '').strip().lower()
+        if args == 'on':
+            self.data.inlineSet.add(ctx.channel.id)
+            await ctx.send("```Inline rolls are on for this channel. Put a dice expression in double brackets to roll it, Ex: I attack [[1d20+5]]```")
+        elif args == 'off':
+            self.data.inlineSet.discard(ctx.channel.id)
+            await ctx.send("```Inline rolls are off for this channel.```")
+        else:
+            state = 'on' if ctx.channel.id in self.data.inlineSet else 'off'
+            await ctx.send(f"```Inline rolls are {state} for this channel. Use !inline on or !inline off to change it.```")
+
+    @commands.Cog.listener()
+    async def on_message(self, message):
+        """
+        Rolls [[dice expressions]] in ordinary messages in channels that turned inline rolls on
+        """
+        spans = Engine.inline_spans(message.content) # Cheap substring check first, runs for every message the bot can see
+        if not spans or message.channel.id not in self.data.inlineSet or message.author.bot:
+            return
+
+        self.data.statsDict['inline_rolls'] += 1
+        await message.channel.send(await Engine.roll_inline_async(spans))
+
+    @commands.Cog.listener()
+    async def on_raw_reaction_add(self, payload):
+        """
+        Rerolls a roll message when someone presses its reroll emoji
+        """
+        if str(payload.emoji) != '🔁' or payload.user_id == self.bot.user.id:
+            return
+
+        reroll = self.rerolls.get(payload.message_id) # Dict lookup, no work for reactions on other messages
+        if reroll is None:
+            return
+
+        self.data.statsDict['rerolls'] += 1
+        roll_msg = await Engine.roll_async(reroll.args, channel = reroll.channel_id, history = (self.data.roll_dict, payload.user_id))
+        channel = self.bot.get_channel(reroll.channel_id) or await self.bot.fetch_channel(reroll.channel_id)
+        msg = channel.get_partial_message(payload.message_id)
+
+        try:
+            if reroll.private:
+                await msg.delete()
+                msg = await channel.send(roll_msg)
+                await msg.add_reaction('🔁')
+                self.rerolls.refresh(payload.message_id, msg.id)
+            else:
+                self.rerolls.refresh(payload.message_id)
+                await msg.edit(content=roll_msg)
+                await msg.remove_reaction('🔁', discord.Object(id=payload.user_id))
+
+        except discord.errors.Forbidden:
+            msg = await channel.fetch_message(msg.id)
+            contents = msg.content
+            contents = contents.rstrip("```")
+            contents += "\n\nThe Manage Messages Permission is needed to use the reroll emoji. See !permissions for help.```"
+            await msg.edit(content=contents)
+
+    async def clear_reroll(self, message_id, reroll):
+        """
+        Removes the reroll emoji from a message that can no longer be rerolled
+        """
+        try:
+            channel = self.bot.get_channel(reroll.channel_id) or await self.bot.fetch_channel(reroll.channel_id)
+            if reroll.private: # The bot can not remove reactions in a DM, so the message is sent again without it
+                msg = await channel.fetch_message(message_id)
                 contents = msg.content
-                contents = contents.rstrip("```")
-                contents += "\n\nThe Manage Messages Permission is needed to use the reroll emoji. See !permissions for help.```"
-                await msg.edit(content=contents)
\ No newline at end of file
+                await msg.delete()
+                await channel.send(contents)
+            else:
+                await channel.get_partial_message(message_id).clear_reaction('🔁')
+        except discord.errors.HTTPException: # Deleted messages and missing permissions
+            pass
+
+    @tasks.loop(minutes = 5)
+    async def expire_rerolls(self):
+        for message_id, reroll in self.rerolls.expire():
+            await self.clear_reroll(message_id, reroll)
+
+    @expire_rerolls.before_loop
+    async def before_expire_rerolls(self):
+        await self.bot.wait_until_ready()
@@ -32,6 +32,11 @@ class Helper(commands.Cog):
             > init- Initiative tracking
             > roll - Dice rolling with complicated expressions
             > d - Simple dice rolling
+            > odds - Exact odds of any dice expression
+            > sim - Simulate a dice expression many times
+            > history - Latest rolls and statistics of this channel
+            > dpr - Expected damage per round of an attack
+            > macro - Save rolls you make often and roll them with !m
             > gm - GM only dice rolling
 
             `> char - Manage your character(s) for initiative tracking (NEW)'
@@ -158,12 +163,113 @@ class Helper(commands.Cog):
             !r 1d20 + 5
             !r 1d1000 + 2d2000 * 3 / 3 - 1
 
-            Skill checks can be built into the dice expression using the < and > symbols.
+            Skill checks can be built into the dice expression using the < and > symbols. The exact chance of success is shown with the result.
             Ex: !roll 1d20 > 15
 
-            You can roll with advantage or disadvantage using the -a and -d flags before the dice expression.
+            You can roll with advantage or disadvantage using the -a and -d flags before the dice expression. -e rolls with elven accuracy, the highest of three rolls.
             Ex: !roll -a 1d20
                 !roll -d 1d20+5
+                !roll -e 1d20+7
+
+            Keep or drop dice with kh (or k), kl, dh and dl after a dice.
+            Ex: !roll 4d6k3
+                !roll 2d20kl1+5
+
+            Dice with ! explode, a dice that rolls its highest face is rolled again and added to it. r<2 rerolls 1s and 2s once and min3 counts anything below 3 as a 3. These apply before keeping or dropping.
+            Ex: !roll 3d6!
+                !roll 2d6r<2+4
+                !roll 4d6min2k3
+
+            Use the -dist flag to see the odds of an expression instead of rolling it, see !help odds.
+            Ex: !roll -dist 1d20+5 >= 15
+
+            Every roll has a roll id. Use !roll verify with the id and the expression to roll it again from the same random numbers and check it against the roll log. Rolls can only be verified in the channel they were made in.
+            Ex: !roll verify 42 1d20+5
+
+            Inline rolls can be turned on for a channel with !inline on, then any dice expression in double brackets is rolled. See !help inline.
+            Ex: I swing [[1d20+5]] and hit for [[2d6+3]]
+            ```
+            '''
+        )
+
+        self.help_str_odds = textwrap.dedent(
+            '''
+            ```
+            !odds calculates the exact odds of a dice expression without rolling it. It shows the average, standard deviation, min, max and percentiles. For skill checks it also shows the chance of success.
+
+            It supports the same expressions as !roll, including keep and drop modifiers and the -a and -d flags. !roll -dist does the same thing.
+
+            Ex: !odds 4d6k3
+            !odds 1d20+5 >= 15
+            !odds -a 1d20+5 >= 15
+            !roll -dist 8d6
+            ```
+            '''
+        )
+
+        self.help_str_sim = textwrap.dedent(
+            '''
+            ```
+            !sim rolls a dice expression many times and shows the average, standard deviation, min, max and a histogram of the results. For skill checks it shows the chance of success.
+
+            It supports everything !roll does, as well as then and count statements. The message is updated as the simulation runs, and it stops early once the result is precise enough. Add n=<trials> to choose the number of trials, the default is 1,000,000 and the maximum is 10,000,000.
+
+            Ex: !sim 4d6k3
+            !sim 1d20+5 >= 15 n=50000
+            !sim 1d20+7>15 then 2d6+4 count 3
+            ```
+            '''
+        )
+
+        self.help_str_inline = textwrap.dedent(
+            '''
+            ```
+            !inline turns inline rolls on or off for a channel. When they are on, any dice expression in double brackets in a message is rolled, up to 10 per message. Only members who can manage channels can change it.
+
+            Ex: !inline on
+            !inline off
+            I swing [[1d20+5]] and hit for [[2d6+3]]
+            ```
+            '''
+        )
+
+        self.help_str_history = textwrap.dedent(
+            '''
+            ```
+            !history shows the latest rolls in a channel and statistics for each player: their average total, how many skill checks passed, and for rolls with a single d20 the average d20, how often it was a natural 20 or 1 and the longest streak of high (11+) and low rolls.
+
+            !history me shows only your rolls and statistics. The last 200 rolls of each channel are kept.
+
+            Ex: !history
+            !history me
+            ```
+            '''
+        )
+
+        self.help_str_macro = textwrap.dedent(
+            '''
+            ```
+            !macro save <name> <expression> saves a roll you make often, then !m <name> rolls it. Macros support everything !roll does, including the -a, -d and -e flags, and are checked when they are saved.
+
+            !macro list shows your macros and !macro delete <name> deletes one. Each user can save up to 50 macros.
+
+            Ex: !macro save attack -a 1d20+7
+            !m attack
+            !macro delete attack
+            ```
+            '''
+        )
+
+        self.help_str_dpr = textwrap.dedent(
+            '''
+            ```
+            !dpr calculates the exact expected damage per round of an attack, including critical hits. The damage can be a weapon, a weapon with extra damage or any dice expression.
+
+            Give an armor class or a range like AC 12-18 to see the whole curve at once. Add adv, dis or elven for advantage, disadvantage or elven accuracy, x<attacks> for more than one attack per round, crit 19 for a larger critical range, and sim or n=<trials> to check the result with a simulation.
+
+            Ex: !dpr longsword+3 +5 vs AC 15
+            !dpr 2d6+4 +7 vs AC 12-18 adv x2
+            !dpr greatsword+5 +9 vs AC 16 crit 19 sim
             ```
             '''
         )
@@ -526,6 +632,24 @@ class Helper(commands.Cog):
 
         elif args == "d":
             return self.help_str_d 
+
+        elif args == "odds" or args == "dist":
+            return self.help_str_odds
+
+        elif args == "sim":
+            return self.help_str_sim
+
+        elif args == "inline":
+            return self.help_str_inline
+
+        elif args == "history":
+            return self.help_str_history
+
+        elif args == "dpr":
+            return self.help_str_dpr
+
+        elif args == "macro" or args == "m":
+            return self.help_str_macro
         
         elif args == "stats":
             return self.help_str_stats 
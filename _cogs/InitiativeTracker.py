@@ -3,7 +3,8 @@ import textwrap
 import asyncio
 from discord.ext import commands
 from operator import attrgetter
-from _cogs.DiceRolls import DiceRoll
+from _dice import Engine
+from _dice.Renderer import SORRY_MSG
 from _cogs.CharacterSelection import CharacterSelectionHandler
 
 
@@ -19,7 +20,6 @@ class InitiativeTracker:
         self.add_order = []
         self.character_list = []
         self.init_messages = []
-        self.dr = DiceRoll()
         self.content = ""
         self.header = "```asciidoc\n= Initiative ="
         self.footer = "```"
@@ -32,7 +32,7 @@ class InitiativeTracker:
         self.content = self.header + f"\n[Round: {self.round_count}]\n\n[You will need to update Feyre's permissions to use all of the initiative tracker's features]\nUse !permissions to learn more.\n\nAdd characters to the tracker by pressing the + icon or using the !init command.\n\nEx: !init Gandalf -i 1d20+5```"
 
     async def add_player(self, user_id, name, init_mod):
-        init_value = await self.dr.parse(init_mod, total_only=True) # Roll init_mod to get value
+        init_value = await Engine.total_async(init_mod) # Roll init_mod to get value
         new_pc = PlayerCharacter(user_id, name, init_mod, init_value)
         updated = False
 
@@ -102,7 +102,7 @@ class InitiativeTracker:
 
     async def update_player(self, user_id, name, init_mod):
         # print("Update Player")
-        init_value = await self.dr.parse(init_mod, total_only=True)
+        init_value = await Engine.total_async(init_mod)
         for c in self.character_list:
             if c.user_id == user_id and c.character_name == name:
                 c.init_mod = init_mod
@@ -171,8 +171,8 @@ class InitiativeTracker:
                 if s == '-b' or s == '-a': # Special case. Parser will parse these because they are dice roll flags
                     break
 
-                total = await self.dr.parse(s, total_only=True) # Try and parse either part of the message. If it parses correctly treat it as an init mod
-                if total != "```I'm sorry, there was something I didnt understand about your input. See !help roll for more info```": # TODO Remove this when dice roller is rewritten.
+                total = await Engine.total_async(s) # Try and parse either part of the message. If it parses correctly treat it as an init mod
+                if total != SORRY_MSG:
                     # Dice parser will accept things like -, +, /, * as a valid init mod so we need to make sure its not one of these
                     try:
                         float(total)
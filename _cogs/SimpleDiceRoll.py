@@ -1,144 +1,43 @@
 import textwrap
 import discord
-import random
-from asteval import Interpreter
 from discord.ext import commands
+from _dice import Engine
+from _dice.Tokenizer import DiceParseError
+
+# Command -> (size of the dice, suffix of the total). Every command is an alias of the same handler.
+DICE_COMMANDS = {
+    'dp': (100, '%'),
+    'd20': (20, ''),
+    'd12': (12, ''),
+    'd10': (10, ''),
+    'd8': (8, ''),
+    'd6': (6, ''),
+    'd4': (4, ''),
+}
 
 class SimpleDiceRoller(commands.Cog):
     def __init__(self, bot, data):
         self.bot = bot
         self.data = data
-        self.aeval = Interpreter()
 
-    @commands.command(aliases = ['Dp'])
-    async def dp(self, ctx, *, args = None):
+    @commands.command(name = 'd20', aliases = [alias for name in DICE_COMMANDS for alias in (name, name.capitalize()) if alias != 'd20'])
+    async def simple_roll(self, ctx, *, args = None):
+        """
+        Rolls a single dice with an optional modifier, the size comes from the name the command was called with
+            Ex: !d20 +5
+        """
         self.data.statsDict['!roll'] += 1
+        size, suffix = DICE_COMMANDS[ctx.invoked_with.lower()]
 
         try:
-            roll = str(random.randint(1, 100))
+            roll, total = Engine.roll_single(size, args)
             if(args):
-                total = self.aeval(roll + args.strip())
-                msg = f'''```css\n{roll}{args.replace(' ', '')} = [{"%.2g" % total}%]```'''
+                msg = f'''```css\n{roll}{args.replace(' ', '')} = [{"%.2g" % total}{suffix}]```'''
 
             else:
-                total = roll
-                msg = f'''```asciidoc\n[{total}%]```'''
+                msg = f'''```asciidoc\n[{total}{suffix}]```'''
 
-        except:
+        except (DiceParseError, OverflowError, ValueError, TypeError):
             msg = f'''```I didn't understand something about your input. Try !roll for more complicated expressions.```'''
 
         await ctx.send(msg)
-
-    @commands.command(aliases = ['D20'])
-    async def d20(self, ctx, *, args = None):
-        self.data.statsDict['!roll'] += 1
-
-        try:
-            roll = str(random.randint(1, 20))
-            if(args):
-                total = self.aeval(roll + args.strip())
-                msg = f'''```css\n{roll}{args.replace(' ', '')} = [{"%.2g" % total}]```'''
-
-            else:
-                total = roll
-                msg = f'''```asciidoc\n[{total}]```'''
-
-        except:
-            msg = f'''```I didn't understand something about your input. Try !roll for more complicated expressions.```'''
-
-        await ctx.send(msg)
-
-    @commands.command(aliases = ['D12'])
-    async def d12(self, ctx, *, args = None):
-        self.data.statsDict['!roll'] += 1
-
-        try:
-            roll = str(random.randint(1, 12))
-            if(args):
-                total = self.aeval(roll + args.strip())
-                msg = f'''```css\n{roll}{args.replace(' ', '')} = [{"%.2g" % total}]```'''
-
-            else:
-                total = roll
-                msg = f'''```asciidoc\n[{total}]```'''
-
-        except:
-            msg = f'''```I didn't understand something about your input. Try !roll for more complicated expressions.```'''
-
-        await ctx.send(msg)
-
-    @commands.command(aliases = ['D10'])
-    async def d10(self, ctx, *, args = None):
-        self.data.statsDict['!roll'] += 1
-
-        try:
-            roll = str(random.randint(1, 10))
-            if(args):
-                total = self.aeval(roll + args.strip())
-                msg = f'''```css\n{roll}{args.replace(' ', '')} = [{"%.2g" % total}]```'''
-
-            else:
-                total = roll
-                msg = f'''```asciidoc\n[{total}]```'''
-
-        except:
-            msg = f'''```I didn't understand something about your input. Try !roll for more complicated expressions.```'''
-
-        await ctx.send(msg)
-
-    @commands.command(aliases = ['D8'])
-    async def d8(self, ctx, *, args = None):
-        self.data.statsDict['!roll'] += 1
-
-        try:
-            roll = str(random.randint(1, 8))
-            if(args):
-                total = self.aeval(roll + args.strip())
-                msg = f'''```css\n{roll}{args.replace(' ', '')} = [{"%.2g" % total}]```'''
-
-            else:
-                total = roll
-                msg = f'''```asciidoc\n[{total}]```'''
-
-        except:
-            msg = f'''```I didn't understand something about your input. Try !roll for more complicated expressions.```'''
-
-        await ctx.send(msg)
-
-    @commands.command(aliases = ['D6'])
-    async def d6(self, ctx, *, args = None):
-        self.data.statsDict['!roll'] += 1
-
-        try:
-            roll = str(random.randint(1, 6))
-            if(args):
-                total = self.aeval(roll + args.strip())
-                msg = f'''```css\n{roll}{args.replace(' ', '')} = [{"%.2g" % total}]```'''
-
-            else:
-                total = roll
-                msg = f'''```asciidoc\n[{total}]```'''
-
-        except:
-            msg = f'''```I didn't understand something about your input. Try !roll for more complicated expressions.```'''
-
-        await ctx.send(msg)
-
-    @commands.command(aliases = ['D4'])
-    async def d4(self, ctx, *, args = None):
-        self.data.statsDict['!roll'] += 1
-
-        try:
-            roll = str(random.randint(1, 4))
-            if(args):
-                total = self.aeval(roll + args.strip())
-                msg = f'''```css\n{roll}{args.replace(' ', '')} = [{"%.2g" % total}]```'''
-
-            else:
-                total = roll
-                msg = f'''```asciidoc\n[{total}]```'''
-
-        except:
-            msg = f'''```I didn't understand something about your input. Try !roll for more complicated expressions.```'''
-
-        await ctx.send(msg)
\ No newline at end of file
@@ -0,0 +1,80 @@
+from functools import lru_cache
+
+from _dice.Tokenizer import DiceParseError, Token, normalize, tokenize
+from _dice.Parser import Parser
+
+def shape_of(items):
+    """
+    Replaces every rolled number with None so expressions with the same layout share a compiled form
+
+    [14, '+5>', 15] -> (None, '+5>', None)
+    """
+    return tuple(i if isinstance(i, str) else None for i in items)
+
+def to_tokens(shape):
+    """
+    Converts a shape into tokens. Rolled numbers become slots that are filled in when the
+    compiled expression is evaluated, so they never need to be turned back into strings.
+
+    (None, '+5>', None) -> [Token(slot, '#'), Token(op, '+'), Token(number, '5'), Token(op, '>'), Token(slot, '#'), Token(end, '')]
+    """
+    tokens = []
+    text = ""
+    pos = 0
+    slot = 0
+
+    for item in shape:
+        if item is not None:
+            text += item # Text is joined first so operators split across items (* and *) still work
+            continue
+
+        if text:
+            tokens.extend(text_tokens(text, pos))
+            pos += len(normalize(text))
+            text = ""
+
+        tokens.append(Token('slot', '#', pos, pos + 1, slot))
+        pos += 1
+        slot += 1
+
+    if text:
+        tokens.extend(text_tokens(text, pos))
+        pos += len(normalize(text))
+
+    tokens.append(Token('end', '', pos, pos))
+    return tokens
+
+def text_tokens(text, offset):
+    tokens = tokenize(normalize(text))[:-1] # Drop the end token
+    for t in tokens:
+        t.start += offset
+        t.end += offset
+    return tokens
+
+@lru_cache(maxsize = 512)
+def compile_shape(shape):
+    expression = ''.join('#' if i is None else normalize(i) for i in shape) # Only used for error messages
+    tokens = to_tokens(shape)
+
+    for t in tokens:
+        if t.kind == 'dice':
+            raise DiceParseError(expression, "Unexpected dice", f"{t.text} should have been rolled before being evaluated.")
+
+    return Parser(expression, tokens).parse().compile()
+
+def evaluate(items):
+    """
+    Evaluates a list of rolled numbers and operators with +, -, *, /, //, %, **, parenthesis and comparisons
+
+    [14, '+', '5'] -> 19
+    [14, '+5>', 15] -> True
+
+    Raises:
+        DiceParseError if the expression is not valid or divides by zero
+    """
+    fn = compile_shape(shape_of(items))
+
+    try:
+        return fn([i for i in items if not isinstance(i, str)])
+    except ZeroDivisionError:
+        raise DiceParseError(''.join(str(i) for i in items), "Division by zero", "The expression divides by zero.")
@@ -0,0 +1,126 @@
+import os
+import time
+import struct
+import hashlib
+import secrets
+import threading
+import numpy as np
+from os import path
+
+RECORD = struct.Struct('<dQQQd') # timestamp, channel, seq, expression hash, total
+MASK = (1 << 64) - 1
+LOG_PATH = path.join(path.dirname(__file__), '..', '_data', 'rolls.log')
+KEY_PATH = path.join(path.dirname(__file__), '..', '_data', 'roll_key.txt')
+
+def stream(key, seq, channel = 0):
+    """
+    Counter-based generator for one roll. Philox is keyed by the channel and a secret key, and the
+    sequence number is the top word of the counter, so every (channel, seq) has its own stream that
+    can be recreated at any time without storing any dice.
+    """
+    bit_generator = np.random.Philox(key = (key << 64) | (channel & MASK), counter = (seq & MASK) << 192)
+    return np.random.Generator(bit_generator)
+
+def expression_hash(text):
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size = 8).digest(), 'little')
+
+class Record:
+    """
+    One roll in the audit log
+
+    Attributes:
+        timestamp -- time.time() when the roll was made
+        channel -- channel id the roll was made in
+        seq -- sequence number of the roll, also its id and its position in the log
+        expression_hash -- expression_hash of the expression that was rolled, including flags
+        total -- result of the roll, 1 or 0 for skill checks
+    """
+    __slots__ = ('timestamp', 'channel', 'seq', 'expression_hash', 'total')
+
+    def __init__(self, timestamp, channel, seq, expression_hash, total):
+        self.timestamp = timestamp
+        self.channel = channel
+        self.seq = seq
+        self.expression_hash = expression_hash
+        self.total = total
+
+class AuditLog:
+    """
+    Binary log of every audited roll. Record n is always at byte n * RECORD.size, so a roll is found
+    by its id without reading the rest of the file. Records are written once and never changed.
+
+    The sequence number is the number of records, so it keeps counting up across restarts and a
+    (channel, seq) stream is never used twice. A roll that never finished leaves an empty record.
+
+    The log and key are opened on first use. Forked worker processes write their own records at
+    their own offsets, so they never need to share state with the bot.
+    """
+    def __init__(self, log_path = LOG_PATH, key_path = KEY_PATH):
+        self.log_path = log_path
+        self.key_path = key_path
+        self.key = None
+        self.fd = None
+        self.next_seq = 0
+        self.lock = threading.Lock()
+
+    def open(self):
+        if self.fd is not None:
+            return
+        with self.lock:
+            if self.fd is not None:
+                return
+            self.key = self.load_key()
+            self.fd = os.open(self.log_path, os.O_RDWR | os.O_CREAT, 0o644)
+            self.next_seq = -(-os.fstat(self.fd).st_size // RECORD.size)
+
+    def load_key(self):
+        """
+        Reads the secret key, creating it the first time. Without it anyone could compute the next roll in a channel.
+        """
+        try:
+            with open(self.key_path, 'r') as file:
+                return int(file.readline().strip(), 16)
+        except (OSError, ValueError):
+            key = secrets.randbits(64)
+            with os.fdopen(os.open(self.key_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w') as file:
+                file.write(f"{key:016x}")
+            return key
+
+    def next(self):
+        """
+        Reserves the next sequence number
+        """
+        self.open()
+        with self.lock:
+            seq = self.next_seq
+            self.next_seq += 1
+        return seq
+
+    def stream(self, channel, seq):
+        self.open()
+        return stream(self.key, seq, channel)
+
+    def write(self, channel, seq, text, total):
+        self.open()
+        try:
+            total = float(total)
+        except OverflowError:
+            total = float('inf') if total > 0 else float('-inf')
+        os.pwrite(self.fd, RECORD.pack(time.time(), channel & MASK, seq, expression_hash(text), total), seq * RECORD.size)
+
+    def read(self, seq):
+        """
+        Returns the Record of a roll, or None if there is no roll with that id
+        """
+        self.open()
+        if seq < 0:
+            return None
+        data = os.pread(self.fd, RECORD.size, seq * RECORD.size)
+        if len(data) < RECORD.size:
+            return None
+        record = Record(*RECORD.unpack(data))
+        if record.timestamp == 0: # The roll timed out before it was written
+            return None
+        return record
+
+audit_log = AuditLog()
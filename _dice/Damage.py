@@ -0,0 +1,233 @@
+import re
+import numpy as np
+
+from _dice.Tokenizer import DiceParseError, normalize
+from _dice.ExpressionCache import expression_cache
+from _dice.Distribution import Distribution
+from _dice.Modifiers import branch_count, ELVEN_ACCURACY
+from _dice.Engine import roll_matrix, check_limits
+from _dice.Renderer import render_dpr
+
+MAX_ATTACKS = 20
+MAX_AC_RANGE = 40 # Most armor classes in one curve
+DEFAULT_SIM_TRIALS = 100000
+MAX_SIM_CELLS = 2 * 10 ** 7 # Largest (armor classes + dice) * trials * attacks simulated at once
+
+# <damage> +<attack bonus> vs AC <n>[-<m>] [adv|dis|elven] [x <attacks>] [crit <n>] [sim|n=<trials>]
+_DPR_RE = re.compile(r"(?P<damage>.+?)\s*(?P<bonus>[-+]\s*\d+)\s*vs\.?\s*(?:ac)?\s*(?P<low>\d+)(?:\s*-\s*(?P<high>\d+))?(?P<rest>.*)", re.IGNORECASE | re.DOTALL)
+_ATTACKS_RE = re.compile(r"\bx\s*(\d+)\b", re.IGNORECASE)
+_CRIT_RE = re.compile(r"\bcrit\s*(\d+)\b", re.IGNORECASE)
+_TRIALS_RE = re.compile(r"\bn\s*=\s*([\d,_]+)", re.IGNORECASE)
+_WEAPON_RE = re.compile(r"\s*(?P<name>[a-z][a-z ,'()]*?)\s*(?P<extra>[-+].*)?", re.IGNORECASE | re.DOTALL)
+
+class AttackRequest:
+    """
+    A parsed !dpr request
+
+    Attributes:
+        damage -- damage text as written, a weapon name or dice expression, Ex: Longsword+3
+        bonus -- attack bonus added to the d20
+        acs -- array of armor classes to calculate
+        advantage, disadvantage -- how the attack roll is made
+        attacks -- attacks made each round
+        crit -- lowest natural roll that is a critical hit
+        trials -- trials to simulate, 0 to only calculate the exact values
+    """
+    def __init__(self, damage, bonus, acs, advantage, disadvantage, attacks, crit, trials):
+        self.damage = damage
+        self.bonus = bonus
+        self.acs = acs
+        self.advantage = advantage
+        self.disadvantage = disadvantage
+        self.attacks = attacks
+        self.crit = crit
+        self.trials = trials
+
+def parse_request(inp):
+    """
+    Parses !dpr arguments
+
+    'longsword+3 +7 vs AC 12-18 adv x2' -> AttackRequest('longsword+3', 7, [12, ..., 18], True, False, 2, 20, 0)
+
+    Raises:
+        DiceParseError
+    """
+    m = _DPR_RE.fullmatch(inp.strip())
+    if m is None:
+        raise DiceParseError(inp, "Invalid attack", "An attack needs damage, an attack bonus and an armor class, Ex: longsword +5 vs AC 15")
+
+    low = int(m.group('low'))
+    high = int(m.group('high')) if m.group('high') else low
+    if high < low:
+        low, high = high, low
+    if high - low + 1 > MAX_AC_RANGE:
+        raise DiceParseError(inp, "Invalid armor class", f"At most {MAX_AC_RANGE} armor classes can be calculated at once.")
+
+    rest = m.group('rest')
+    attacks = int(_ATTACKS_RE.search(rest).group(1)) if _ATTACKS_RE.search(rest) else 1
+    if not 1 <= attacks <= MAX_ATTACKS:
+        raise DiceParseError(inp, "Invalid number of attacks", f"The number of attacks must be between 1 and {MAX_ATTACKS}.")
+
+    crit = int(_CRIT_RE.search(rest).group(1)) if _CRIT_RE.search(rest) else 20
+    if not 2 <= crit <= 20:
+        raise DiceParseError(inp, "Invalid critical range", "Critical hits must happen on a natural roll between 2 and 20.")
+
+    trials = 0
+    if _TRIALS_RE.search(rest):
+        trials = int(_TRIALS_RE.search(rest).group(1).replace(',', '').replace('_', '') or 0)
+    elif re.search(r"\bsim\b", rest, re.IGNORECASE):
+        trials = DEFAULT_SIM_TRIALS
+
+    advantage = re.search(r"\badv", rest, re.IGNORECASE) is not None
+    if re.search(r"\belven", rest, re.IGNORECASE):
+        advantage = ELVEN_ACCURACY
+    disadvantage = re.search(r"\bdis", rest, re.IGNORECASE) is not None
+
+    return AttackRequest(m.group('damage').strip(), int(m.group('bonus').replace(' ', '')), np.arange(low, high + 1),
+                         advantage, disadvantage, attacks, crit, trials)
+
+def weapon_name(damage):
+    """
+    Splits a damage text that starts with a weapon name, or returns None if it is a dice expression
+
+    'Longsword+3' -> ('Longsword', '+3')
+    """
+    m = _WEAPON_RE.fullmatch(damage)
+    if m is None or re.fullmatch(r"\d*d\d.*", damage.strip(), re.IGNORECASE):
+        return None
+    return m.group('name'), m.group('extra') or ''
+
+def no_negative(dist):
+    """
+    Damage is never less than 0
+    """
+    return Distribution.aggregate(np.maximum(dist.values, 0), dist.probs)
+
+def damage_distributions(expression):
+    """
+    Exact distributions of the damage of a hit and of a critical hit, which rolls every dice twice
+
+    Raises:
+        DiceParseError
+    """
+    compiled = expression_cache.get(expression)
+    if compiled.is_check():
+        raise DiceParseError(expression, "Invalid damage", "Damage can not be a skill check.")
+
+    dice = [Distribution.of_dice(number, size, mods) for (number, size), mods in zip(compiled.dice, compiled.modifiers)]
+    try:
+        hit = compiled.evaluate(dice)
+        crit = compiled.evaluate([d + d for d in dice]) # Both copies are independent, d + d convolves them
+    except ZeroDivisionError:
+        raise DiceParseError(expression, "Division by zero", "The expression can divide by zero.")
+
+    if not isinstance(hit, Distribution): # No dice, a critical hit does the same damage
+        hit = crit = Distribution.constant(hit)
+    return no_negative(hit), no_negative(crit)
+
+def d20_faces(advantage, disadvantage):
+    """
+    Chance of each natural roll of the attack roll, indexed from 1
+    """
+    d20 = Distribution.of_dice(1, 20)
+    if advantage and not disadvantage:
+        d20 = d20.best_of(branch_count(advantage, disadvantage))
+    elif disadvantage and not advantage:
+        d20 = d20.worst_of(2)
+    return d20.probs
+
+def hit_chances(request):
+    """
+    Chance of a normal hit and of a critical hit against every armor class at once. A natural 1
+    always misses and a critical hit always hits.
+
+    Returns two arrays with one entry per armor class
+    """
+    faces = np.arange(1, 21)
+    probs = d20_faces(request.advantage, request.disadvantage)
+    crit = faces >= request.crit
+    hits = (faces + request.bonus >= request.acs[:, None]) & (faces > 1) & ~crit # (armor classes, 20)
+    return hits @ probs, np.full(len(request.acs), probs[crit].sum())
+
+def expected_damage(request, expression):
+    """
+    Exact damage per round against every armor class
+
+    Returns (hit chance, crit chance, mean, standard deviation), each an array with one entry per armor class
+
+    Raises:
+        DiceParseError
+    """
+    hit, crit = damage_distributions(expression)
+    p_hit, p_crit = hit_chances(request)
+
+    # Each attack is a mixture of a miss, a hit and a critical hit, the attacks of a round are independent
+    mean = p_hit * hit.mean() + p_crit * crit.mean()
+    square = p_hit * (hit.std() ** 2 + hit.mean() ** 2) + p_crit * (crit.std() ** 2 + crit.mean() ** 2)
+    variance = np.maximum(square - mean ** 2, 0.0)
+    return p_hit + p_crit, p_crit, request.attacks * mean, np.sqrt(request.attacks * variance)
+
+def simulate_damage(request, expression, roll_matrix = roll_matrix):
+    """
+    Rolls every attack of request.trials rounds once and scores them against every armor class,
+    so the whole curve comes from the same rolls
+
+    Returns (mean, standard deviation), each an array with one entry per armor class
+
+    Raises:
+        DiceParseError
+    """
+    compiled = expression_cache.get(expression)
+    limit = check_limits(compiled)
+    if limit:
+        raise DiceParseError(expression, "Expression too large", limit)
+
+    # Every attack rolls all of its dice and is scored against every armor class
+    cells = (len(request.acs) + sum(number for number, _ in compiled.dice)) * request.attacks
+    if cells > MAX_SIM_CELLS:
+        raise DiceParseError(expression, "Expression too large", "There are too many dice to simulate, leave out sim to only calculate the exact values.")
+    trials = min(request.trials, MAX_SIM_CELLS // cells)
+    count = trials * request.attacks
+
+    # Hits and critical hits never happen on the same attack, so a critical hit reuses the dice of the hit and adds a second copy
+    totals, hit = compiled.roll_batch(count, roll_matrix)
+    second, _ = compiled.roll_batch(count, roll_matrix)
+    crit = np.broadcast_to(compiled.evaluate([a + b for a, b in zip(totals, second)]), (count,))
+
+    cancelled = request.advantage and request.disadvantage # Advantage and disadvantage cancel out
+    rolls = roll_matrix(1 if cancelled else branch_count(request.advantage, request.disadvantage), 20, count)
+    natural = rolls.max(axis=1) if request.advantage and not request.disadvantage else rolls.min(axis=1)
+
+    is_crit = natural >= request.crit
+    is_hit = (natural + request.bonus >= request.acs[:, None]) & (natural > 1) & ~is_crit # (armor classes, count)
+    damage = np.where(is_hit, np.maximum(hit, 0), 0) + np.where(is_crit, np.maximum(crit, 0), 0)
+    rounds = damage.reshape(len(request.acs), trials, request.attacks).sum(axis=2).astype(np.float64)
+    return rounds.mean(axis=1), rounds.std(axis=1, ddof=1) if trials > 1 else np.zeros(len(request.acs))
+
+def damage_expression(damage, weapon = None):
+    """
+    Normalized damage expression of a weapon and any extra damage written after it, or of a dice expression
+
+    Raises:
+        DiceParseError
+    """
+    if weapon is None:
+        return normalize(damage)
+    split = weapon_name(damage)
+    extra = split[1] if split else ''
+    if not weapon.damage_die.strip():
+        raise DiceParseError(damage, "Invalid damage", f"A {weapon.name} doesn't do any damage.")
+    return normalize(weapon.damage_die + extra)
+
+def dpr(request, expression, label):
+    """
+    Calculates the damage per round of a parsed request and constructs the message,
+    label is how the damage is shown, Ex: Longsword (1d8+3)
+    """
+    try:
+        chance, crit, mean, std = expected_damage(request, expression)
+        simulated = simulate_damage(request, expression) if request.trials > 0 else None
+    except (DiceParseError, ZeroDivisionError, OverflowError, ValueError, MemoryError) as e:
+        message = e.message if isinstance(e, DiceParseError) else "The damage could not be calculated."
+        return f"```I'm sorry, I couldn't calculate that attack. {message} See !help dpr for more info```"
+    return render_dpr(request, label, chance, crit, mean, std, simulated)
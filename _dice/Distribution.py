@@ -0,0 +1,528 @@
+import operator
+import threading
+import numpy as np
+from math import comb, log2
+from functools import lru_cache
+from contextlib import contextmanager
+from collections import OrderedDict
+
+from _dice.Tokenizer import DiceParseError, tokenize
+from _dice.Parser import COMPARISON_OPERATORS, bounded_pow
+from _dice.Modifiers import drop_count, split_modifiers, branch_count, MAX_EXPLOSIONS
+from _dice.ExpressionCache import expression_cache
+
+MAX_SUPPORT = 10 ** 6 # Largest number of outcomes a single distribution may have, about 0.1s of FFT
+MAX_OUTER = 4 * 10 ** 6 # Largest number of pairs when combining two distributions without convolution
+MAX_KEEP_STEPS = 2 * 10 ** 5 # Limit on the keep dynamic program, size * number^2
+FFT_THRESHOLD = 512 # Convolutions longer than this use the FFT
+MAX_CHECK_SUPPORT = 10 ** 5 # Largest sum of dice faces a check roll calculates its chance of success for
+MAX_CHECK_KEEP = 10 ** 6 # Largest keep dynamic program a check roll runs, about 10ms, see keep_cost
+MAX_CHECK_CELLS = 2 * 10 ** 5 # Outcomes and pairs a check roll may combine in total, about 15ms, see cell_budget
+MAX_CACHED_OUTCOMES = 2 * 10 ** 6 # Outcomes kept by the check side cache, 16 bytes each
+EXPLODE_TAIL = 1e-12 # Exploding dice are cut off once the chance of rolling that high is below this
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+def too_large(expression = ""):
+    return DiceParseError(expression, "Expression too large", "This expression has too many possible outcomes to calculate exactly.")
+
+_budget = threading.local()
+
+@contextmanager
+def cell_budget(cells):
+    """
+    Limits every Distribution combined inside the block to cells outcomes and pairs in total,
+    too_large is raised once they are spent
+    """
+    previous = getattr(_budget, 'cells', None)
+    _budget.cells = cells
+    try:
+        yield
+    finally:
+        _budget.cells = previous
+
+def spend(cells):
+    left = getattr(_budget, 'cells', None)
+    if left is None:
+        return
+    if cells > left:
+        raise too_large()
+    _budget.cells = left - cells
+
+def fft_length(n):
+    """
+    Next power of two, the FFT of an awkward length such as a large prime is many times slower
+    """
+    return 1 << (n - 1).bit_length()
+
+def convolve(a, b):
+    """
+    Convolves two pmfs, using the FFT for long inputs
+    """
+    n = len(a) + len(b) - 1
+    if n <= FFT_THRESHOLD:
+        return np.convolve(a, b)
+    m = fft_length(n)
+    out = np.fft.irfft(np.fft.rfft(a, m) * np.fft.rfft(b, m), m)[:n]
+    return np.clip(out, 0, None)
+
+def power(pmf, n):
+    """
+    pmf of the sum of n independent copies of pmf
+    """
+    if n == 0:
+        return np.ones(1)
+
+    length = (len(pmf) - 1) * n + 1
+    if length > FFT_THRESHOLD: # One transform, raise to the nth power, transform back
+        m = fft_length(length) # Zero padded past length, so nothing wraps around
+        out = np.clip(np.fft.irfft(np.fft.rfft(pmf, m) ** n, m)[:length], 0, None)
+        return out / out.sum()
+
+    result = np.ones(1)
+    base = pmf
+    while n: # Exponentiation by squaring
+        if n & 1:
+            result = np.convolve(result, base)
+        n >>= 1
+        if n:
+            base = np.convolve(base, base)
+    return result
+
+def reachable_sums(support, n):
+    """
+    Which sums of n values can actually happen, given which single values can (1.0 or 0.0)
+    """
+    result = np.ones(1)
+    while n: # Exponentiation by squaring, rounded back to 0 and 1 so counts never grow
+        if n & 1:
+            result = (convolve(result, support) > 0.5).astype(np.float64)
+        n >>= 1
+        if n:
+            support = (convolve(support, support) > 0.5).astype(np.float64)
+    return result > 0.5
+
+def face_pmf(size, modifiers):
+    """
+    pmf (indexed by face) of a single dice with explode, reroll and minimum modifiers applied in order
+    """
+    pmf = np.zeros(size + 1)
+    pmf[1:] = 1.0 / size
+    for name, n in modifiers:
+        if name == 'reroll': # Faces up to n are replaced by a fresh roll
+            low = pmf[:n + 1].sum()
+            pmf[:n + 1] = 0.0
+            pmf[1:size + 1] += low / size
+        elif name == 'minimum':
+            pmf[n] += pmf[:n].sum()
+            pmf[:n] = 0.0
+        else: # Every face equal to size rolls again and adds, depth by depth
+            depth = 0
+            while depth < MAX_EXPLOSIONS and pmf[size * (depth + 1):].sum() > EXPLODE_TAIL:
+                start = size * (depth + 1)
+                if len(pmf) <= start + size:
+                    pmf = np.concatenate([pmf, np.zeros(start + size + 1 - len(pmf))])
+                exploding = pmf[start]
+                pmf[start] = 0.0
+                pmf[start + 1:start + size + 1] += exploding / size
+                depth += 1
+                if len(pmf) > MAX_SUPPORT:
+                    raise too_large(f"1d{size}")
+            pmf = np.trim_zeros(pmf, 'b')
+            pmf /= pmf.sum()
+    return pmf
+
+def keep_highest(number, pmf, keep):
+    """
+    pmf (indexed by sum) of the highest keep dice out of number dice, pmf is indexed by face
+
+    Faces are assigned from highest to lowest. A dice without a face yet shows v with chance
+    pmf[v] / P(face <= v), so the number of them showing v is Binomial(remaining, that chance).
+    For a plain dice that is 1/v.
+    """
+    cdf = np.cumsum(pmf)
+    max_sum = keep * (len(pmf) - 1)
+    dp = np.zeros((number + 1, max_sum + 1)) # dp[j] = pmf of the kept sum once j dice have a face
+    dp[0, 0] = 1.0
+
+    for v in range(len(pmf) - 1, -1, -1):
+        if pmf[v] == 0:
+            continue
+        new = np.zeros_like(dp)
+        p = min(pmf[v] / cdf[v], 1.0)
+        for j in range(number + 1):
+            row = dp[j]
+            if not row.any():
+                continue
+            remaining = number - j
+            for c in range(remaining + 1):
+                weight = comb(remaining, c) * p ** c * (1 - p) ** (remaining - c)
+                if weight == 0:
+                    continue
+                shift = min(c, max(keep - j, 0)) * v
+                new[j + c, shift:] += weight * row[:max_sum + 1 - shift]
+        dp = new
+
+    return dp[number]
+
+class Distribution:
+    """
+    Exact probability distribution of a dice expression. Supports the same operators as the
+    evaluator, so a compiled expression can be evaluated with distributions in place of rolls.
+
+    Attributes:
+        values -- sorted array of every possible outcome
+        probs -- probability of each outcome
+        compared -- for skill checks, the distribution of the left side of the comparison
+    """
+    def __init__(self, values, probs, compared = None):
+        self.values = values
+        self.probs = probs
+        self.compared = compared
+
+    @classmethod
+    def dense(cls, offset, pmf, reachable = None):
+        """
+        Distribution over offset, offset + 1, ... dropping outcomes that cannot happen
+
+        FFT results can round very unlikely outcomes down to 0, so reachable can be given explicitly
+        """
+        values = np.arange(offset, offset + len(pmf), dtype=np.int64)
+        mask = pmf > 0 if reachable is None else reachable
+        return cls(values[mask], pmf[mask])
+
+    @classmethod
+    def aggregate(cls, values, probs, compared = None):
+        values, inverse = np.unique(values, return_inverse=True)
+        return cls(values, np.bincount(inverse.ravel(), weights=probs.ravel()), compared)
+
+    @classmethod
+    def constant(cls, value):
+        return cls(np.array([value]), np.ones(1))
+
+    @classmethod
+    def of_dice(cls, number, size, modifiers = ()):
+        """
+        Distribution of number dice of size size, including keep, drop, explode, reroll and minimum modifiers
+        """
+        face, modifiers = split_modifiers(modifiers)
+        if face:
+            return cls.of_faces(number, face_pmf(size, face), modifiers, f"{number}d{size}")
+
+        if len(modifiers) > 1:
+            raise DiceParseError(str(number) + 'd' + str(size), "Invalid keep count", "Only one keep or drop modifier per dice is supported.")
+
+        keep, highest = number, True
+        if modifiers:
+            drop, highest = drop_count(modifiers[0], number) # Dropping the lowest keeps the highest
+            keep = number - min(drop, number)
+
+        if keep == 0:
+            return cls.constant(0)
+        if size > MAX_SUPPORT or keep == number and number * (size - 1) + 1 > MAX_SUPPORT:
+            raise too_large(f"{number}d{size}")
+
+        faces = np.arange(1, size + 1, dtype=np.float64)
+        if keep == number:
+            pmf = power(np.full(size, 1.0 / size), number)
+            return cls.dense(number, pmf, np.ones(len(pmf), dtype=bool)) # Every sum from number to number * size can happen
+
+        if keep == 1: # Order statistics, P(max <= x) = (x/size)^number
+            cdf = (faces / size) ** number
+            pmf = np.diff(cdf, prepend=0.0)
+            if not highest: # P(min >= x) = ((size - x + 1)/size)^number
+                pmf = pmf[::-1]
+            return cls.dense(1, pmf)
+
+        uniform = np.full(size + 1, 1.0 / size)
+        uniform[0] = 0.0
+        return cls.of_faces(number, uniform, modifiers, f"{number}d{size}")
+
+    @classmethod
+    def of_faces(cls, number, pmf, modifiers, text):
+        """
+        Distribution of number dice that each roll a face with the chances in pmf (indexed by face),
+        including keep and drop modifiers
+        """
+        if len(modifiers) > 1:
+            raise DiceParseError(text, "Invalid keep count", "Only one keep or drop modifier per dice is supported.")
+
+        keep, highest = number, True
+        if modifiers:
+            drop, highest = drop_count(modifiers[0], number)
+            keep = number - min(drop, number)
+
+        if keep == 0:
+            return cls.constant(0)
+
+        top = len(pmf) - 1
+        if keep == number:
+            if top * number + 1 > MAX_SUPPORT:
+                raise too_large(text)
+            return cls.dense(0, power(pmf, number), reachable_sums((pmf > 0).astype(np.float64), number))
+
+        if len(pmf) * (number + 1) ** 2 > MAX_KEEP_STEPS:
+            raise too_large(text)
+        if highest:
+            return cls.dense(0, keep_highest(number, pmf, keep))
+        # The lowest dice are the highest dice of top - face
+        sums = keep_highest(number, pmf[::-1], keep)
+        mask = sums > 0
+        return cls.aggregate(keep * top - np.arange(len(sums))[mask], sums[mask])
+
+    def is_integer(self):
+        return np.issubdtype(self.values.dtype, np.integer)
+
+    @staticmethod
+    def bounds(x):
+        """
+        Lowest and highest integer outcome of a distribution or constant, None if it is not an integer
+        """
+        if isinstance(x, Distribution):
+            return (int(x.values[0]), int(x.values[-1])) if x.is_integer() else None
+        return (int(x), int(x)) if isinstance(x, (int, np.integer)) else None
+
+    @staticmethod
+    def check_int64(left, right, op):
+        """
+        Raises too_large if combining integer outcomes with op could leave int64, numpy would wrap
+        around without an error. The extremes of +, - and * are always at the corners, a power is
+        at most the largest base to the largest exponent.
+        """
+        a, b = Distribution.bounds(left), Distribution.bounds(right)
+        if a is None or b is None:
+            return
+        if op is bounded_pow:
+            base = max(abs(a[0]), abs(a[1]))
+            if base > 1 and b[1] > 0 and b[1] * log2(base) >= 63:
+                raise too_large()
+            return
+        corners = [op(x, y) for x in a for y in b]
+        if min(corners) < INT64_MIN or max(corners) > INT64_MAX:
+            raise too_large()
+
+    def binary(self, other, op, reflected = False):
+        if op in (operator.truediv, operator.floordiv, operator.mod):
+            divisor = self if reflected else other
+            if isinstance(divisor, Distribution) and (divisor.values == 0).any() or not isinstance(divisor, Distribution) and divisor == 0:
+                raise ZeroDivisionError
+        if op in (operator.add, operator.sub, operator.mul, bounded_pow):
+            self.check_int64(*((other, self) if reflected else (self, other)), op)
+
+        if not isinstance(other, Distribution): # Constant, apply to every outcome
+            spend(len(self.values))
+            values = op(other, self.values) if reflected else op(self.values, other)
+            return Distribution.aggregate(values, self.probs)
+
+        left, right = (other, self) if reflected else (self, other)
+        if op in (operator.add, operator.sub) and left.is_integer() and right.is_integer():
+            if op is operator.sub:
+                right = -right
+            length = (left.values[-1] - left.values[0]) + (right.values[-1] - right.values[0]) + 1
+            if length > MAX_SUPPORT:
+                raise too_large()
+            spend(length)
+            pmf = convolve(left.to_pmf(), right.to_pmf())
+            reachable = convolve(left.support(), right.support()) > 0.5 # Sums that can actually happen
+            return Distribution.dense(left.values[0] + right.values[0], pmf / pmf.sum(), reachable)
+
+        if len(left.values) * len(right.values) > MAX_OUTER:
+            raise too_large()
+        spend(len(left.values) * len(right.values))
+        values = op(left.values[:, None], right.values[None, :])
+        return Distribution.aggregate(values, np.outer(left.probs, right.probs))
+
+    def compare(self, other, op):
+        result = self.binary(other, op)
+        result.compared = self
+        return result
+
+    def to_pmf(self):
+        pmf = np.zeros(int(self.values[-1] - self.values[0]) + 1)
+        pmf[self.values - self.values[0]] = self.probs
+        return pmf
+
+    def support(self):
+        support = np.zeros(int(self.values[-1] - self.values[0]) + 1)
+        support[self.values - self.values[0]] = 1.0
+        return support
+
+    def __add__(self, other): return self.binary(other, operator.add)
+    def __radd__(self, other): return self.binary(other, operator.add, True)
+    def __sub__(self, other): return self.binary(other, operator.sub)
+    def __rsub__(self, other): return self.binary(other, operator.sub, True)
+    def __mul__(self, other): return self.binary(other, operator.mul)
+    def __rmul__(self, other): return self.binary(other, operator.mul, True)
+    def __truediv__(self, other): return self.binary(other, operator.truediv)
+    def __rtruediv__(self, other): return self.binary(other, operator.truediv, True)
+    def __floordiv__(self, other): return self.binary(other, operator.floordiv)
+    def __rfloordiv__(self, other): return self.binary(other, operator.floordiv, True)
+    def __mod__(self, other): return self.binary(other, operator.mod)
+    def __rmod__(self, other): return self.binary(other, operator.mod, True)
+    def __pow__(self, other): return self.binary(other, bounded_pow)
+    def __rpow__(self, other): return self.binary(other, bounded_pow, True)
+    def __lt__(self, other): return self.compare(other, operator.lt)
+    def __gt__(self, other): return self.compare(other, operator.gt)
+    def __le__(self, other): return self.compare(other, operator.le)
+    def __ge__(self, other): return self.compare(other, operator.ge)
+    def __eq__(self, other): return self.compare(other, operator.eq)
+    __hash__ = object.__hash__
+
+    def __neg__(self):
+        if self.is_integer() and self.values[0] == INT64_MIN:
+            raise too_large()
+        return Distribution(-self.values[::-1], self.probs[::-1])
+
+    def __pos__(self):
+        return self
+
+    def __bool__(self):
+        raise DiceParseError("", "Invalid comparison", "Chained comparisons are not supported.")
+
+    def best_of(self, n):
+        """
+        Distribution of the highest of n independent copies, used for advantage
+        """
+        cdf = np.cumsum(self.probs) ** n
+        compared = self.compared.best_of(n) if self.compared is not None else None
+        return Distribution(self.values, np.diff(cdf, prepend=0.0), compared)
+
+    def worst_of(self, n):
+        """
+        Distribution of the lowest of n independent copies, used for disadvantage
+        """
+        survival = np.cumsum(self.probs[::-1])[::-1] ** n
+        compared = self.compared.worst_of(n) if self.compared is not None else None
+        return Distribution(self.values, -np.diff(survival, append=0.0), compared)
+
+    def is_check(self):
+        return self.values.dtype == bool
+
+    def success(self):
+        """
+        Probability that a skill check succeeds
+        """
+        return float(self.probs[self.values].sum())
+
+    def mean(self):
+        return float(np.dot(self.values.astype(np.float64), self.probs))
+
+    def std(self):
+        values = self.values.astype(np.float64)
+        return float(np.sqrt(max(np.dot(values ** 2, self.probs) - self.mean() ** 2, 0.0)))
+
+    def percentile(self, q):
+        idx = np.searchsorted(np.cumsum(self.probs), q / 100 - 1e-12)
+        return self.values[min(idx, len(self.values) - 1)]
+
+def expression_distribution(expression):
+    """
+    Builds the exact distribution of an expression by evaluating its compiled form with a
+    Distribution in place of each dice
+
+    Raises:
+        DiceParseError
+    """
+    compiled = expression_cache.get(expression)
+    totals = [Distribution.of_dice(number, size, mods) for (number, size), mods in zip(compiled.dice, compiled.modifiers)]
+    spend(sum(len(t.values) for t in totals))
+
+    try:
+        result = compiled.evaluate(totals)
+    except ZeroDivisionError:
+        raise DiceParseError(compiled.expression, "Division by zero", "The expression can divide by zero.")
+
+    if not isinstance(result, Distribution): # No dice in the expression
+        result = Distribution.constant(result)
+    return result
+
+def split_check(expression):
+    """
+    Splits a normalized skill check at its comparison
+
+    '1d20+7>=15' -> ('1d20+7', '>=', '15')
+    """
+    depth = 0
+    for token in tokenize(expression):
+        if token.kind != 'op':
+            continue
+        if token.text == '(':
+            depth += 1
+        elif token.text == ')':
+            depth -= 1
+        elif depth == 0 and token.text in COMPARISON_OPERATORS:
+            return expression[:token.start], token.text, expression[token.end:]
+    return None
+
+class DistributionCache:
+    """
+    LRU of the distributions of skill check sides, so every check with the same left side shares it.
+    Bounded by the outcomes held rather than the number of entries, one distribution can hold a
+    million outcomes.
+
+    Attributes:
+        maxoutcomes: outcomes kept across every distribution
+        outcomes: outcomes currently kept
+    """
+    def __init__(self, maxoutcomes = MAX_CACHED_OUTCOMES):
+        self.maxoutcomes = maxoutcomes
+        self.outcomes = 0
+        self.distributions = OrderedDict()
+
+    def get(self, expression):
+        dist = self.distributions.get(expression)
+        if dist is not None:
+            self.distributions.move_to_end(expression)
+            return dist
+
+        dist = expression_distribution(expression)
+        if len(dist.values) <= self.maxoutcomes:
+            self.distributions[expression] = dist
+            self.outcomes += len(dist.values)
+            while self.outcomes > self.maxoutcomes:
+                _, old = self.distributions.popitem(last = False)
+                self.outcomes -= len(old.values)
+        return dist
+
+side_cache = DistributionCache()
+
+def keep_cost(compiled):
+    """
+    Rough cost of the keep dynamic program for every keep and drop dice in a compiled expression,
+    size * number^2 steps that each shift the kept sums
+    """
+    cost = 0
+    for (number, size), mods in zip(compiled.dice, compiled.modifiers):
+        _, keep = split_modifiers(mods)
+        if keep:
+            kept = number - min(drop_count(keep[0], number)[0], number)
+            if kept not in (0, number):
+                cost += (size + 1) * (number + 1) ** 2 * (kept * size + 1)
+    return cost
+
+@lru_cache(maxsize = 4096)
+def check_probability(expression, advantage = False, disadvantage = False):
+    """
+    Exact chance that a skill check succeeds, or None if the expression is not a single
+    comparison or has too many outcomes. After the first time a check is one cache lookup.
+    Checks with large dice or more than MAX_CHECK_CELLS of work are skipped so a roll never waits on a slow
+    calculation, !odds still calculates them.
+
+    '1d20+7>=15' -> 0.65
+    """
+    try:
+        compiled = expression_cache.get(expression)
+        if sum(number * size for number, size in compiled.dice) > MAX_CHECK_SUPPORT or keep_cost(compiled) > MAX_CHECK_KEEP:
+            return None
+        parts = split_check(expression)
+        if parts is None:
+            return None
+        left, op, right = parts
+        with cell_budget(MAX_CHECK_CELLS):
+            dist = side_cache.get(left).compare(side_cache.get(right), COMPARISON_OPERATORS[op])
+        if advantage:
+            dist = dist.best_of(branch_count(advantage, disadvantage))
+        elif disadvantage:
+            dist = dist.worst_of(2)
+        return dist.success()
+    except (DiceParseError, ZeroDivisionError, OverflowError, ValueError):
+        return None
@@ -0,0 +1,551 @@
+"""
+Entry point for everything that rolls dice. Cogs call the sync functions when they are already
+off the event loop and the async ones from commands, which send expensive rolls to a worker process.
+
+    roll("1d20+5") -> rendered message
+    total("1d20+5") -> 17
+    odds("1d20+5 >= 15") -> rendered distribution, odds_async runs it in a worker process
+    roll_then_count("1d20>15 then 1d8 count 12") -> (hits, misses)
+    roll_inline(["1d20+5", "2d6+3"]) -> rendered message for [[1d20+5]] and [[2d6+3]]
+    verify(42, channel, "1d20+5") -> rolls roll 42 again from its stream and checks it against the audit log
+"""
+import asyncio
+import re
+import numpy as np
+from functools import lru_cache
+from datetime import datetime, timezone
+from concurrent.futures.process import BrokenProcessPool
+
+from _dice.Tokenizer import DiceParseError, normalize
+from _dice.ExpressionCache import expression_cache
+from _dice.Arithmetic import evaluate
+from _dice.Parser import BATCH_LIMIT
+from _dice.Distribution import expression_distribution, check_probability
+from _dice.Pool import DicePool, POOL_THRESHOLD, max_dice
+from _dice.Modifiers import KeptRolls, split_modifiers, branch_count, ELVEN_ACCURACY
+from _dice.RandomPool import random_pool
+from _dice.Audit import audit_log, expression_hash, MASK
+from _dice.Offload import offloader, estimate_cost, EXPENSIVE_COST
+from _dice.Renderer import SORRY_MSG, TIMEOUT_MSG, ODDS_TIMEOUT_MSG, render_advantage, render_breakdown, render_roll, render_roll_no_format, render_distribution, render_inline, render_verify, add_roll_id
+
+MAX_SIZE = 9223372036854775808
+MAX_INLINE_ROLLS = 10 # Most [[rolls]] answered from a single message
+
+# Text that could be a dice expression typed without !roll, like !1d20+5 or !r2d6. It must contain a dice.
+_DIRTY_ROLL_RE = re.compile(r"r?(?P<expression>[-+*/%<>=().\d]*d\d[-+*/%<>=().\ddkhlrmin!]*)")
+
+# Modifier of the !d commands that only adds or subtracts a number, +5
+_OFFSET_RE = re.compile(r"\s*([-+])\s*(\d+)\s*")
+
+# Inline rolls in chat, I swing [[1d20+5]]. The expression can not contain brackets and is kept short.
+_INLINE_RE = re.compile(r"\[\[([^\[\]]{1,100})\]\]")
+
+def read_flags(inp):
+    """
+    Removes the advantage and disadvantage flags from the start of the input. Elven accuracy (-e)
+    is advantage with three rolls, advantage is ELVEN_ACCURACY instead of True.
+
+    '-a 1d20+5' -> (True, False, '1d20+5')
+    """
+    advantage = False
+    disadvantage = False
+    inp = inp.lower().strip()
+    inp = inp.replace('\\', '')
+    if(inp.startswith('-a')):
+        advantage = True
+        inp = inp.replace('-a', '').strip()
+
+    elif(inp.startswith('-e')):
+        advantage = ELVEN_ACCURACY
+        inp = inp.replace('-e', '').strip()
+
+    if(inp.startswith('-d')):
+        disadvantage = True
+        inp = inp.replace('-d', '').strip()
+
+    return advantage, disadvantage, inp
+
+def dirty_roll(text):
+    """
+    Returns the dice expression in text if it is a valid roll that was typed as a command, otherwise None.
+    The expression is compiled here, so rolling it afterwards is a cache hit.
+
+    'r1d20+5' -> '1d20+5'
+    'help' -> None
+    """
+    m = _DIRTY_ROLL_RE.fullmatch(text.lower())
+    if m is None:
+        return None
+
+    try:
+        expression_cache.get(m.group('expression'))
+    except DiceParseError:
+        return None
+    return m.group('expression')
+
+def roll_dice(number, size):
+    """
+    Rolls number dice of size size. Large rolls are returned as a DicePool so the individual dice are never stored.
+    """
+    if number > POOL_THRESHOLD:
+        return DicePool.sample(number, size)
+    return random_pool.roll(size, number)
+
+def roll_matrix(number, size, count):
+    """
+    Rolls number dice of size size count times as a (count, number) array
+    """
+    return random_pool.matrix(size, number, count)
+
+def stream_roller(rng):
+    """
+    Returns a roll_dice that draws every dice from rng, so a roll can be repeated from its stream
+    """
+    def roll_stream(number, size):
+        if number > POOL_THRESHOLD:
+            return DicePool.sample(number, size, rng)
+        return rng.integers(1, size + 1, number, dtype=np.int64).tolist()
+    return roll_stream
+
+def stream_matrix(rng):
+    """
+    Returns a roll_matrix that draws every dice from rng
+    """
+    def roll_stream_matrix(number, size, count):
+        return rng.integers(1, size + 1, (count, number), dtype=np.int64)
+    return roll_stream_matrix
+
+@lru_cache(maxsize = 128)
+def parse_offset(modifier):
+    """
+    Returns the number a modifier like +5 or - 2 adds to a roll, or None if it needs the evaluator
+
+    '+5' -> 5
+    '*2' -> None
+    """
+    m = _OFFSET_RE.fullmatch(modifier)
+    if m is None:
+        return None
+    return -int(m.group(2)) if m.group(1) == '-' else int(m.group(2))
+
+def roll_single(size, modifier = None):
+    """
+    Rolls one dice and applies an arithmetic modifier, used by the !d commands. Plain + and - modifiers
+    are added directly, anything else goes through the evaluator.
+
+    (20, '+5') -> (14, 19)
+    """
+    roll = random_pool.randint(size)
+    if not modifier:
+        return roll, roll
+
+    offset = parse_offset(modifier)
+    if offset is not None:
+        return roll, roll + offset
+    return roll, evaluate([roll, modifier])
+
+def check_limits(expression):
+    """
+    Returns a message if any dice in the expression is too large to roll, otherwise None
+    """
+    for numDice, typeDice in expression.dice:
+        if(numDice > max_dice(typeDice)):
+            return f"Your inp is too big! Maximum number of dice is {max_dice(typeDice):,}"
+
+        if(typeDice > MAX_SIZE):
+            return ("Your inp is too big! Maximum size is 9,223,372,036,854,775,807")
+    return None
+
+def audit_text(expression, advantage, disadvantage):
+    """
+    Text that is hashed in the audit log. The flags are included because they change how many times the dice are rolled.
+    """
+    flag = '-e ' if advantage == ELVEN_ACCURACY else '-a ' if advantage else '-d ' if disadvantage else ''
+    return flag + expression.expression
+
+def batchable(expression):
+    """
+    Whether every dice can be rolled as one small matrix, large rolls are DicePools
+    """
+    return all(number <= POOL_THRESHOLD and number * size < BATCH_LIMIT for number, size in expression.dice)
+
+def roll_expression(expression, advantage, disadvantage, dice = roll_dice, matrix = roll_matrix):
+    """
+    Rolls an expression once, or two or three times with advantage or disadvantage. All the rolls
+    are drawn at once with matrix(number, size, count), so advantage costs about the same as one roll.
+
+    Returns the rolls and result of the first roll, the results of every roll (or None),
+    the final result and the rolls that made the final result
+    """
+    branches = branch_count(advantage, disadvantage)
+    if branches == 1:
+        rolls, result = expression.roll(dice)
+        return rolls, result, None, result, rolls
+
+    if batchable(expression):
+        branch_rolls, results = expression.roll_branches(branches, matrix)
+    else:
+        branch_rolls, results = zip(*(expression.roll(dice) for _ in range(branches)))
+
+    # The first roll wins ties, the same as comparing the rolls one at a time
+    pick = max if advantage else min
+    best = pick(range(branches), key = results.__getitem__)
+    return branch_rolls[0], results[0], list(results), results[best], branch_rolls[best]
+
+def natural_d20(expression, rolls):
+    """
+    The d20 that was rolled in expressions with a single d20 like 1d20+5, 2d20k1 or 1d20>15, otherwise 0
+    """
+    natural = 0
+    for (number, size), mods, r in zip(expression.dice, expression.modifiers, rolls):
+        if size != 20:
+            continue
+        kept = r.kept if isinstance(r, KeptRolls) else r
+        if natural or not isinstance(kept, list) or len(kept) != 1 or split_modifiers(mods)[0]: # More than one d20, or not a natural roll
+            return 0
+        natural = kept[0]
+    return natural
+
+def roll_outcome(expression, advantage = False, disadvantage = False, gm = False, total_only = False, audit = None):
+    """
+    Same as roll_compiled, also returns (final result, natural d20) of the roll or None if nothing was rolled
+    """
+    limit = check_limits(expression)
+    if limit:
+        return limit, None
+
+    if audit:
+        rng = audit_log.stream(*audit)
+        dice, matrix = stream_roller(rng), stream_matrix(rng)
+    else:
+        dice, matrix = roll_dice, roll_matrix
+    try:
+        rolls, result, results, final, finalRolls = roll_expression(expression, advantage, disadvantage, dice, matrix)
+    except (ZeroDivisionError, OverflowError, ValueError, DiceParseError):
+        return SORRY_MSG, None
+
+    if audit:
+        audit_log.write(audit[0], audit[1], audit_text(expression, advantage, disadvantage), final)
+    outcome = (final, natural_d20(expression, finalRolls))
+
+    if total_only:
+        return result, outcome
+
+    rollExpStr = expression.expression
+    chance = check_probability(rollExpStr, advantage, disadvantage) if expression.is_check() else None
+
+    try:
+        if(advantage or disadvantage): # Only the totals are shown
+            outMsg = render_advantage(advantage, disadvantage, rollExpStr, results, chance)
+        else:
+            unEvalStr = render_breakdown(expression, rolls)
+            if(not gm):
+                outMsg = render_roll(rollExpStr, unEvalStr, result, chance)
+            else:
+                outMsg = render_roll_no_format(rollExpStr, unEvalStr, result, chance)
+    except (OverflowError, ValueError): # The total is too large to print
+        return SORRY_MSG, outcome
+
+    return (add_roll_id(outMsg, audit[1]) if audit else outMsg), outcome
+
+def roll_compiled(expression, advantage = False, disadvantage = False, gm = False, total_only = False, audit = None):
+    """
+    Rolls a compiled expression and renders the result
+
+    audit is (channel id, sequence number) for rolls that are audited. Their dice come from that
+    roll's stream, the result is written to the audit log and the message shows the roll id.
+    """
+    return roll_outcome(expression, advantage, disadvantage, gm, total_only, audit)[0]
+
+def roll(inp, gm = False, total_only = False, channel = None):
+    """
+    Rolls a dice expression such as !roll -a 5d20 + 1d6 * 2 and returns the rendered message,
+    or only the total. Returns an invalid input message if the input is not recongnized.
+
+    Rolls with a channel id are audited, see roll_compiled.
+    """
+    advantage, disadvantage, inp = read_flags(inp)
+    try:
+        expression = expression_cache.get(inp)
+    except DiceParseError:
+        return SORRY_MSG
+    audit = (channel, audit_log.next()) if channel is not None else None
+    return roll_compiled(expression, advantage, disadvantage, gm, total_only, audit)
+
+def roll_in_worker(inp, advantage, disadvantage, gm, total_only, audit = None):
+    """
+    Entry point for rolls sent to the offloader, compiled expressions cannot be pickled so the input is compiled again.
+    Audited rolls only need their channel and sequence number to draw from the same stream as the bot would.
+    """
+    return roll_outcome(expression_cache.get(inp), advantage, disadvantage, gm, total_only, audit)
+
+async def roll_async(inp, gm = False, total_only = False, channel = None, history = None):
+    """
+    Same as roll, expensive rolls run in a worker process so they never block the event loop
+
+    history is (RollHistory, user id), the roll is added to the channel's history
+    """
+    advantage, disadvantage, inp = read_flags(inp)
+    try:
+        expression = expression_cache.get(inp)
+    except DiceParseError:
+        return SORRY_MSG
+    return await roll_compiled_async(expression, advantage, disadvantage, gm, total_only, channel, history)
+
+async def roll_compiled_async(expression, advantage = False, disadvantage = False, gm = False, total_only = False, channel = None, history = None):
+    """
+    Same as roll_async for an expression that is already compiled, such as a saved macro
+    """
+    audit = (channel, audit_log.next()) if channel is not None else None
+
+    if offloader.is_expensive(expression, branch_count(advantage, disadvantage)):
+        try:
+            outMsg, outcome = await offloader.run(roll_in_worker, expression.expression, advantage, disadvantage, gm, total_only, audit)
+        except (asyncio.TimeoutError, BrokenProcessPool):
+            return TIMEOUT_MSG
+    else:
+        outMsg, outcome = roll_outcome(expression, advantage, disadvantage, gm, total_only, audit)
+
+    if history and outcome and channel is not None:
+        rolls, user = history
+        text = audit_text(expression, advantage, disadvantage)
+        rolls.add(channel, user, expression_hash(text), text, *outcome)
+    return outMsg
+
+def verify(roll_id, channel, inp = None):
+    """
+    Looks up an audited roll made in channel. With the expression that was rolled, the roll is
+    made again from its stream and the result is checked against the log. Rolls from other
+    channels are not found, so their totals can only be seen where they were rolled.
+
+    Ex: !roll verify 42 -a 1d20+5
+    """
+    record = audit_log.read(roll_id)
+    if record is None or record.channel != channel & MASK:
+        return f"```I couldn't find a roll with id {roll_id}.```"
+
+    when = datetime.fromtimestamp(record.timestamp, timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC")
+    if not inp:
+        return render_verify(roll_id, when, record.total)
+
+    advantage, disadvantage, inp = read_flags(inp)
+    try:
+        expression = expression_cache.get(inp)
+    except DiceParseError:
+        return SORRY_MSG
+
+    text = audit_text(expression, advantage, disadvantage)
+    if expression_hash(text) != record.expression_hash:
+        return render_verify(roll_id, when, record.total, text)
+
+    try:
+        rng = audit_log.stream(record.channel, roll_id)
+        rolls, result, results, final, _ = roll_expression(expression, advantage, disadvantage, stream_roller(rng), stream_matrix(rng))
+        breakdown = render_breakdown(expression, rolls) if results is None else ' & '.join(f"[{r}]" for r in results)
+        matches = float(final) == record.total
+    except (ZeroDivisionError, OverflowError, ValueError, DiceParseError):
+        return SORRY_MSG
+    return render_verify(roll_id, when, record.total, text, breakdown, final, matches)
+
+async def verify_async(roll_id, channel, inp = None):
+    """
+    Same as verify, an expensive roll is made again in a worker process so it never blocks the event loop
+    """
+    if inp:
+        advantage, disadvantage, text = read_flags(inp)
+        try:
+            expression = expression_cache.get(text)
+        except DiceParseError:
+            return SORRY_MSG
+        if offloader.is_expensive(expression, branch_count(advantage, disadvantage)):
+            try:
+                return await offloader.run(verify, roll_id, channel, inp)
+            except (asyncio.TimeoutError, BrokenProcessPool):
+                return TIMEOUT_MSG
+    return verify(roll_id, channel, inp)
+
+def total(inp):
+    """
+    Rolls and returns only the total, or an invalid input message
+    """
+    return roll(inp, total_only = True)
+
+async def total_async(inp):
+    return await roll_async(inp, total_only = True)
+
+def odds(inp):
+    """
+    Calculates the exact odds of a dice expression without rolling any dice
+    Ex: !odds 2d20k1+5 >= 15
+    """
+    advantage, disadvantage, inp = read_flags(inp)
+    try:
+        dist = expression_distribution(inp)
+        if advantage:
+            dist = dist.best_of(branch_count(advantage, disadvantage))
+        elif disadvantage:
+            dist = dist.worst_of(2)
+    except DiceParseError as e:
+        return f"```I'm sorry, I couldn't calculate the odds of that expression. {e.message} See !help odds for more info```"
+
+    return render_distribution(advantage, disadvantage, normalize(inp), dist)
+
+async def odds_async(inp):
+    """
+    Same as odds, calculated in a worker process with a deadline. Even expressions inside the
+    support limits can take a large FFT, so odds never run on the event loop.
+    """
+    try:
+        return await offloader.run(odds, inp)
+    except (asyncio.TimeoutError, BrokenProcessPool):
+        return ODDS_TIMEOUT_MSG
+
+def inline_spans(content):
+    """
+    Returns the expressions inside [[ ]] in a chat message, at most MAX_INLINE_ROLLS of them.
+    Checking for [[ first means almost every message is rejected without running the regex.
+
+    'I swing [[1d20+5]] and hit for [[2d6+3]]' -> ['1d20+5', '2d6+3']
+    """
+    if '[[' not in content:
+        return []
+    return _INLINE_RE.findall(content)[:MAX_INLINE_ROLLS]
+
+def roll_inline(spans):
+    """
+    Rolls every inline expression of a message and renders them as one message.
+    Expressions that are not understood or too large are reported instead of rolled.
+    """
+    results = []
+    for span in spans:
+        try:
+            expression = expression_cache.get(span)
+        except DiceParseError:
+            results.append((span, None, None))
+            continue
+
+        if check_limits(expression):
+            results.append((expression.expression, None, None))
+            continue
+
+        try:
+            rolls, result = expression.roll(roll_dice)
+            results.append((expression.expression, render_breakdown(expression, rolls), result))
+        except (ZeroDivisionError, OverflowError, ValueError, DiceParseError):
+            results.append((expression.expression, None, None))
+    return render_inline(results)
+
+async def roll_inline_async(spans):
+    """
+    Same as roll_inline, if the rolls of a message are expensive together the whole message runs in a worker process
+    """
+    cost = 0
+    for span in spans:
+        try:
+            cost += estimate_cost(expression_cache.get(span))
+        except DiceParseError:
+            pass
+
+    if cost > EXPENSIVE_COST:
+        try:
+            return await offloader.run(roll_inline, spans)
+        except (asyncio.TimeoutError, BrokenProcessPool):
+            return TIMEOUT_MSG
+    return roll_inline(spans)
+
+def compile_chain(inp):
+    """
+    Compiles expressions joined with then (t) and repeated with count (c)
+
+    1d20>15 then 1d8 count 12 -> ('1d20>15t1d8c12', [CompiledExpression, 't', CompiledExpression], 12)
+
+    Raises:
+        DiceParseError
+    """
+    text = normalize(inp).replace('then', 't').replace('count', 'c').replace('keep', 'k')
+    parts = re.split('(t|c)', text)
+
+    count = 1 # Default count to 1 (meaning count is not included)
+    if parts.count('c') > 1:
+        raise DiceParseError(text, "Invalid count statement", "Only one instance of count (c) is supported.")
+    if parts.count('c') == 1:
+        count_index = parts.index('c')
+        try:
+            count = int(parts[count_index + 1])
+        except (IndexError, ValueError):
+            raise DiceParseError(text, "Invalid count statement", "A count statement must be followed by an integer.")
+        parts = parts[:count_index]
+
+    if '' in parts:
+        raise DiceParseError(text, "Invalid then statement", "Every then statement needs a dice expression on both sides.")
+
+    chain = [p if p == 't' else expression_cache.get(p) for p in parts]
+    for i in range(len(chain)):
+        if chain[i] != 't':
+            continue
+        if i == 0 or chain[i - 1] == 't' or not chain[i - 1].is_check():
+            raise DiceParseError(text, "Invalid then statement", "A then statement must follow a skill check or other roll that results in True or False.")
+        if i + 1 >= len(chain) or chain[i + 1] == 't':
+            raise DiceParseError(text, "Invalid then statement", "A then statement must be followed by a dice expression.")
+
+    return text, chain, count
+
+def roll_chain(chain, count, roll_matrix = roll_matrix):
+    """
+    Rolls every expression in a chain count times at once, drawing the dice with roll_matrix(number, size, count)
+
+    Returns a list of (passed, results, left side) for each then statement, each an array with one entry per roll
+    """
+    rolled = [c if c == 't' else (c,) + c.roll_batch(count, roll_matrix) for c in chain]
+
+    thens = []
+    for i in range(len(rolled)):
+        if rolled[i] == 't':
+            expression, totals, passed = rolled[i - 1]
+            left_side = np.broadcast_to(expression.left_side(totals), (count,))
+            thens.append((passed, rolled[i + 1][2], left_side))
+
+    if not thens: # A single expression, its results are the left side of nothing
+        thens.append((None, rolled[0][2], None))
+    return thens
+
+def integers(values):
+    """
+    Checks become 1 or 0, totals too large for int64 stay python ints
+    """
+    return values if values.dtype == object else values.astype(np.int64)
+
+def roll_then_count(inp):
+    """
+    Rolls expressions joined with then (t) and repeated with count (c). Every part is rolled
+    count times at once.
+
+    1d20>15 then 1d8 count 12 -> the 1d8 of every roll that passed and the left side of every roll that failed
+
+    Raises:
+        DiceParseError
+    """
+    text, chain, count = compile_chain(inp)
+    thens = roll_chain(chain, count)
+    if thens[0][0] is None: # No then statements
+        return [], []
+
+    # Boolean indexing walks the rows in order, so results are in the same order as rolling one count at a time
+    passed = np.stack([t[0] for t in thens], axis=1)
+    results = np.stack([integers(t[1]) for t in thens], axis=1)[passed].tolist() # Successful checks add the roll that follows the then statement
+    failures = np.stack([integers(t[2]) for t in thens], axis=1)[~passed].tolist() # Unsuccessful checks add the roll that was checked
+
+    return results, failures
+
+def sample_chain(chain, count, trials, roll_matrix = roll_matrix):
+    """
+    Rolls a compiled chain trials times and returns the value of each trial. Each trial adds up
+    count rolls. A then statement adds the roll that follows it when its check passes, skill
+    checks without a then are 1 for a success and 0 for a failure.
+    """
+    thens = roll_chain(chain, trials * count, roll_matrix)
+    if thens[0][0] is None:
+        values = thens[0][1].astype(np.float64)
+    else:
+        values = sum(np.where(passed, results, 0).astype(np.float64) for passed, results, _ in thens)
+    return values.reshape(trials, count).sum(axis=1)
@@ -0,0 +1,65 @@
+from collections import OrderedDict
+
+from _dice.Tokenizer import DiceParseError, normalize
+from _dice.Parser import compile_expression
+
+class ExpressionCache:
+    """
+    Bounded LRU cache of compiled dice expressions keyed by the normalized expression.
+    Expressions that fail to parse are cached too so repeated bad input is rejected quickly.
+
+    Attributes:
+        maxsize: maximum number of expressions kept
+        hits: number of lookups that were already compiled
+        misses: number of lookups that had to be parsed
+    """
+    def __init__(self, maxsize = 1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.expressions = OrderedDict()
+
+    def get(self, expression):
+        """
+        Returns the CompiledExpression for expression
+
+        Raises:
+            DiceParseError if the expression is not valid
+        """
+        key = normalize(expression)
+        compiled = self.expressions.get(key)
+
+        if compiled is not None:
+            self.hits += 1
+            self.expressions.move_to_end(key)
+        else:
+            self.misses += 1
+            try:
+                compiled = compile_expression(key)
+            except DiceParseError as e:
+                compiled = e
+
+            self.expressions[key] = compiled
+            if len(self.expressions) > self.maxsize:
+                self.expressions.popitem(last = False)
+
+        if isinstance(compiled, DiceParseError):
+            raise compiled.with_traceback(None)
+        return compiled
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        if lookups == 0:
+            return 0.0
+        return self.hits / lookups
+
+    def stats(self):
+        return {
+            'size': len(self.expressions),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hit_rate()
+        }
+
+# Shared by every cog in the process
+expression_cache = ExpressionCache()
@@ -0,0 +1,171 @@
+import numpy as np
+
+# Flag -> modifier name. k is keep highest, the original keep flag
+KEEP_MODIFIERS = {
+    'k': 'keep',
+    'kh': 'keep',
+    'kl': 'keep_lowest',
+    'dh': 'drop_highest',
+    'dl': 'drop_lowest',
+}
+
+# Flag -> modifier name for modifiers that change the faces rolled, they are applied before keep and drop
+FACE_MODIFIERS = {
+    '!': 'explode',
+    'r<': 'reroll',
+    'min': 'minimum',
+}
+MAX_EXPLOSIONS = 100 # A dice stops exploding after this many extra rolls
+ELVEN_ACCURACY = 3 # Value of advantage for elven accuracy (-e), the highest of three rolls
+
+def branch_count(advantage, disadvantage):
+    """
+    Number of times an expression is rolled with advantage or disadvantage
+    """
+    if advantage == ELVEN_ACCURACY:
+        return 3
+    return 2 if advantage or disadvantage else 1
+
+def split_modifiers(modifiers):
+    """
+    Splits the modifiers of a dice into face modifiers and keep/drop modifiers, each in the order they were written
+    """
+    face = tuple(m for m in modifiers if m[0] in FACE_MODIFIERS.values())
+    keep = tuple(m for m in modifiers if m[0] not in FACE_MODIFIERS.values())
+    return face, keep
+
+def apply_face_modifiers(rolls, modifiers, size, draw):
+    """
+    Applies explode, reroll and minimum modifiers to an array of rolls of any shape.
+    draw(n) rolls n new dice as a 1d array.
+
+    Exploding dice that roll the highest face are rolled again and the new roll is added to
+    them. Only the dice that exploded are redrawn each round, so 100d6! takes a handful of
+    vectorized draws instead of a loop over every die.
+
+    [6, 2, 1], [('explode', None)] -> [10, 2, 1] (the 6 exploded into a 4)
+    """
+    rolls = np.array(rolls, dtype=np.int64)
+    flat = rolls.reshape(-1)
+    for name, n in modifiers:
+        if name == 'reroll': # Reroll once, the new roll is kept even if it is also low
+            idx = np.flatnonzero(flat <= n)
+            flat[idx] = draw(len(idx))
+        elif name == 'minimum':
+            np.maximum(flat, n, out=flat)
+        else:
+            idx = np.flatnonzero(flat == size)
+            for _ in range(MAX_EXPLOSIONS):
+                if not len(idx):
+                    break
+                new = np.asarray(draw(len(idx)), dtype=np.int64)
+                flat[idx] += new
+                idx = idx[new == size]
+    return rolls
+
+def drop_count(mod, number):
+    """
+    Converts a keep/drop modifier into the number of dice to drop and whether the lowest dice are dropped
+
+    ('keep', 3) with 4 dice -> (1, True)
+    """
+    name, n = mod
+    if name == 'keep':
+        return max(number - n, 0), True
+    if name == 'keep_lowest':
+        return max(number - n, 0), False
+    if name == 'drop_lowest':
+        return n, True
+    return n, False
+
+def drop_mask(rolls, drop, lowest = True):
+    """
+    Returns a boolean mask of the dice to drop from a 1d array of rolls
+
+    np.partition finds the cutoff in linear time. Ties at the cutoff are dropped in the order
+    they were rolled, the same as repeatedly removing min(rolls) (or max(rolls)).
+    """
+    mask = np.zeros(len(rolls), dtype=bool)
+    if drop <= 0:
+        return mask
+    if drop >= len(rolls):
+        mask[:] = True
+        return mask
+
+    values = rolls if lowest else -rolls
+    cutoff = np.partition(values, drop - 1)[drop - 1]
+    mask = values < cutoff
+    ties = np.flatnonzero(values == cutoff)[:drop - np.count_nonzero(mask)]
+    mask[ties] = True
+    return mask
+
+class KeptRolls:
+    """
+    Rolls of a dice with keep or drop modifiers
+
+    Attributes:
+        kept -- rolls that count towards the total, in the order they were rolled
+        dropped -- rolls that were removed, in the order they were removed
+    """
+    def __init__(self, kept, dropped):
+        self.kept = kept
+        self.dropped = dropped
+
+    @property
+    def total(self):
+        return sum(self.kept)
+
+    def __str__(self):
+        if not self.dropped:
+            return str(self.kept)
+        return f"{self.kept} (dropped {', '.join(str(d) for d in self.dropped)})"
+
+def apply_modifiers(rolls, modifiers, size = None, draw = None):
+    """
+    Applies modifiers to a list of rolls or a DicePool. Face modifiers come first, then keep/drop
+    modifiers in order. draw(n) rolls n more dice of size size for explode and reroll.
+
+    [3, 6, 1, 4], [('keep', 3)] -> KeptRolls([3, 6, 4], [1])
+    """
+    face, keep = split_modifiers(modifiers)
+    if not isinstance(rolls, list): # DicePool
+        for name, n in face:
+            rolls = rolls.explode() if name == 'explode' else getattr(rolls, name)(n)
+        for mod in keep:
+            rolls = rolls.keep(*drop_count(mod, rolls.number))
+        return rolls
+
+    kept = apply_face_modifiers(rolls, face, size, draw) if face else np.array(rolls, dtype=np.int64)
+    if not keep:
+        return kept.tolist()
+
+    dropped = []
+    for mod in keep:
+        drop, lowest = drop_count(mod, len(kept))
+        mask = drop_mask(kept, drop, lowest)
+
+        # Dropped dice are listed in the order they would be removed, lowest first for keep
+        removed = np.sort(kept[mask])
+        dropped.extend(removed.tolist() if lowest else removed[::-1].tolist())
+        kept = kept[~mask]
+    return KeptRolls(kept.tolist(), dropped)
+
+def apply_modifiers_batch(rolls, modifiers, size = None, draw = None):
+    """
+    Applies modifiers to every row of a (count, number) array of rolls
+
+    Only the sums are needed so ties do not matter and each row is partitioned instead of sorted
+    """
+    face, keep = split_modifiers(modifiers)
+    if face:
+        rolls = apply_face_modifiers(rolls, face, size, draw)
+    for mod in keep:
+        drop, lowest = drop_count(mod, rolls.shape[1])
+        if drop >= rolls.shape[1]:
+            rolls = rolls[:, :0]
+        elif drop > 0 and lowest:
+            rolls = np.partition(rolls, drop, axis=1)[:, drop:]
+        elif drop > 0:
+            keep = rolls.shape[1] - drop
+            rolls = np.partition(rolls, keep - 1, axis=1)[:, :keep]
+    return rolls
@@ -0,0 +1,89 @@
+import asyncio
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from _dice.Pool import POOL_THRESHOLD, MAX_MULTINOMIAL_FACES
+from _dice.RandomPool import random_pool
+
+EXPENSIVE_COST = 10 ** 5 # Expressions that cost more than this are rolled in a worker process
+POWER_COST = 10 ** 6 # ** can build enormous numbers from a short expression
+DEADLINE = 5.0 # Seconds a roll may take in a worker before it is cancelled
+WORKERS = 2
+
+def dice_cost(number, size):
+    """
+    Rough cost of rolling number dice of size size, in units of one small dice roll
+    """
+    if number > POOL_THRESHOLD and size <= MAX_MULTINOMIAL_FACES: # Faces are counted, the number of dice does not matter
+        return size
+    return number * (size.bit_length() // 16 + 1) # Every die is drawn, large dice are slower to add and print
+
+def estimate_cost(expression, rolls = 1):
+    """
+    Estimates the cost of rolling a CompiledExpression rolls times
+    """
+    cost = len(expression.expression) + sum(dice_cost(number, size) for number, size in expression.dice)
+    if '**' in expression.expression:
+        cost += POWER_COST
+    return cost * rolls
+
+def init_worker():
+    """
+    Forked workers start with a copy of the parent's random state and a RandomPool whose
+    refill thread did not survive the fork, so both are replaced
+    """
+    np.random.seed()
+    random_pool.restart()
+
+class Offloader:
+    """
+    Runs expensive rolls in a process pool so they cannot block the event loop.
+
+    A job that misses its deadline cannot be interrupted, so the whole pool is terminated and
+    a new one is started on the next job. Other jobs running in the pool at the same time fail
+    with BrokenProcessPool.
+    """
+    def __init__(self, workers = WORKERS, deadline = DEADLINE):
+        self.workers = workers
+        self.deadline = deadline
+        self.executor = None
+
+    def is_expensive(self, expression, rolls = 1):
+        return estimate_cost(expression, rolls) > EXPENSIVE_COST
+
+    def start(self):
+        if self.executor is None:
+            context = multiprocessing.get_context('fork') # spawn would import Feyre.py again and start a second bot
+            self.executor = ProcessPoolExecutor(self.workers, mp_context = context, initializer = init_worker)
+        return self.executor
+
+    def stop(self, executor):
+        """
+        Kills every worker of executor, including any runaway jobs
+        """
+        if self.executor is executor:
+            self.executor = None
+        for process in list((executor._processes or {}).values()):
+            process.terminate()
+        executor.shutdown(wait = False)
+
+    async def run(self, fn, *args):
+        """
+        Runs fn(*args) in a worker process
+
+        Raises:
+            asyncio.TimeoutError if the job takes longer than the deadline
+            BrokenProcessPool if the pool was stopped while the job was running
+        """
+        executor = self.start()
+        loop = asyncio.get_event_loop()
+        future = loop.run_in_executor(executor, fn, *args)
+        try:
+            return await asyncio.wait_for(future, self.deadline)
+        except (asyncio.TimeoutError, BrokenProcessPool):
+            self.stop(executor)
+            raise
+
+offloader = Offloader()
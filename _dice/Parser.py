@@ -0,0 +1,347 @@
+import operator
+import numpy as np
+
+from _dice.Tokenizer import DiceParseError, tokenize
+from _dice.Pool import total_of
+from _dice.Modifiers import apply_modifiers, apply_modifiers_batch
+
+BATCH_LIMIT = 2 ** 48 # Largest number * size of a dice summed in int64, larger sums could overflow
+MAX_EXPONENT = 10000 # Largest exponent of **, the same limit asteval had
+MAX_POWER_BITS = 10 ** 5 # Largest result of ** between integers, in bits
+INT64_LIMIT = 2.0 ** 63
+
+def power_too_large():
+    return DiceParseError("**", "Invalid exponent", f"Exponents can be at most {MAX_EXPONENT:,} and powers at most {MAX_POWER_BITS:,} bits long.")
+
+def bounded_pow(base, exponent):
+    """
+    ** with a limit on the exponent and on the size of the result. A big integer power holds the
+    GIL until it is done, so it can't be stopped by a deadline or moved to a thread.
+
+    Raises:
+        DiceParseError if the exponent or the result is too large
+    """
+    if isinstance(base, np.ndarray) or isinstance(exponent, np.ndarray):
+        return array_pow(base, exponent)
+    if isinstance(exponent, (int, float, np.number)) and abs(exponent) > MAX_EXPONENT:
+        raise power_too_large()
+    if isinstance(base, int) and isinstance(exponent, int) and exponent > 0 and abs(base).bit_length() * exponent > MAX_POWER_BITS:
+        raise power_too_large()
+    return base ** exponent # Distributions apply bounded_pow to their outcomes
+
+def array_pow(base, exponent):
+    """
+    bounded_pow of batches of rolls. Object arrays hold python ints and are checked one by one,
+    integer arrays are checked against int64 so a power never wraps around.
+    """
+    if np.max(np.abs(exponent)) > MAX_EXPONENT:
+        raise power_too_large()
+    if np.asarray(base).dtype == object or np.asarray(exponent).dtype == object:
+        return np.frompyfunc(bounded_pow, 2, 1)(base, exponent)
+    if np.issubdtype(np.result_type(base, exponent), np.integer):
+        with np.errstate(over = 'ignore'):
+            if (np.abs(np.asarray(base, dtype=np.float64)) ** np.asarray(exponent, dtype=np.float64) >= INT64_LIMIT).any():
+                raise power_too_large()
+    return base ** exponent
+
+BINARY_OPERATORS = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': operator.truediv,
+    '//': operator.floordiv,
+    '%': operator.mod,
+    '**': bounded_pow,
+}
+
+COMPARISON_OPERATORS = {
+    '<': operator.lt,
+    '>': operator.gt,
+    '<=': operator.le,
+    '>=': operator.ge,
+    '==': operator.eq,
+}
+
+#region AST
+class Number:
+    def __init__(self, value):
+        self.value = value
+
+    def compile(self):
+        value = self.value
+        return lambda totals: value
+
+class Dice:
+    def __init__(self, number, size, slot):
+        self.number = number
+        self.size = size
+        self.slot = slot # Index of this dice in CompiledExpression.dice
+
+    def compile(self):
+        slot = self.slot
+        return lambda totals: totals[slot]
+
+class Slot:
+    """
+    A number that is only known when the expression is evaluated, such as an already rolled dice
+    """
+    def __init__(self, slot):
+        self.slot = slot
+
+    def compile(self):
+        slot = self.slot
+        return lambda totals: totals[slot]
+
+class UnaryOp:
+    def __init__(self, op, operand):
+        self.op = op
+        self.operand = operand
+
+    def compile(self):
+        operand = self.operand.compile()
+        if self.op == '-':
+            return lambda totals: -operand(totals)
+        return lambda totals: +operand(totals)
+
+class BinaryOp:
+    def __init__(self, op, left, right):
+        self.op = op
+        self.left = left
+        self.right = right
+
+    def compile(self):
+        fn = BINARY_OPERATORS[self.op]
+        left = self.left.compile()
+        right = self.right.compile()
+        return lambda totals: fn(left(totals), right(totals))
+
+class Comparison:
+    """
+    Chained comparison, 1 < 1d20 < 10 is evaluated the same way python would
+    """
+    def __init__(self, ops, operands):
+        self.ops = ops
+        self.operands = operands
+
+    def compile(self):
+        fns = [COMPARISON_OPERATORS[op] for op in self.ops]
+        operands = [o.compile() for o in self.operands]
+
+        if len(fns) == 1:
+            fn, left, right = fns[0], operands[0], operands[1]
+            return lambda totals: fn(left(totals), right(totals))
+
+        def compare(totals):
+            left = operands[0](totals)
+            for fn, operand in zip(fns, operands[1:]):
+                right = operand(totals)
+                if not fn(left, right):
+                    return False
+                left = right
+            return True
+        return compare
+#endregion
+
+class Parser:
+    """
+    Recursive descent parser for dice expressions. Precedence follows python:
+
+    comparison: arith ((< | > | <= | >= | ==) arith)*
+    arith:      term ((+ | -) term)*
+    term:       factor ((* | / | // | %) factor)*
+    factor:     (+ | -) factor | power
+    power:      atom (** factor)?
+    atom:       number | dice | slot | ( comparison )
+    """
+    def __init__(self, expression, tokens = None):
+        self.expression = expression
+        self.tokens = tokens if tokens is not None else tokenize(expression)
+        self.pos = 0
+        self.dice = [] # (number, size) in the order they appear
+
+    def peek(self):
+        return self.tokens[self.pos]
+
+    def advance(self):
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def error(self, token):
+        if token.kind == 'end':
+            return DiceParseError(self.expression, "Unexpected end of expression", "The expression ended before it was complete.")
+        return DiceParseError(self.expression, "Unexpected token", f"I didn't expect {token.text} at index {token.start}.")
+
+    def parse(self):
+        node = self.comparison()
+        if self.peek().kind != 'end':
+            raise self.error(self.peek())
+        return node
+
+    def comparison(self):
+        operands = [self.arith()]
+        ops = []
+        while self.peek().kind == 'op' and self.peek().text in COMPARISON_OPERATORS:
+            ops.append(self.advance().text)
+            operands.append(self.arith())
+        if ops:
+            return Comparison(ops, operands)
+        return operands[0]
+
+    def arith(self):
+        node = self.term()
+        while self.peek().kind == 'op' and self.peek().text in ('+', '-'):
+            op = self.advance().text
+            node = BinaryOp(op, node, self.term())
+        return node
+
+    def term(self):
+        node = self.factor()
+        while self.peek().kind == 'op' and self.peek().text in ('*', '/', '//', '%'):
+            op = self.advance().text
+            node = BinaryOp(op, node, self.factor())
+        return node
+
+    def factor(self):
+        if self.peek().kind == 'op' and self.peek().text in ('+', '-'):
+            op = self.advance().text
+            return UnaryOp(op, self.factor())
+        return self.power()
+
+    def power(self):
+        node = self.atom()
+        if self.peek().kind == 'op' and self.peek().text == '**':
+            self.advance()
+            node = BinaryOp('**', node, self.factor())
+        return node
+
+    def atom(self):
+        token = self.advance()
+        if token.kind == 'number':
+            return Number(token.value)
+
+        if token.kind == 'slot':
+            return Slot(token.value)
+
+        if token.kind == 'dice':
+            number, size = token.value
+            node = Dice(number, size, len(self.dice))
+            self.dice.append(token)
+            return node
+
+        if token.kind == 'op' and token.text == '(':
+            node = self.comparison()
+            closing = self.advance()
+            if closing.kind != 'op' or closing.text != ')':
+                raise self.error(closing)
+            return node
+
+        raise self.error(token)
+
+class CompiledExpression:
+    """
+    A parsed dice expression. Parsing only happens once, rolling a compiled expression only
+    costs the dice rolls and the arithmetic.
+
+    Attributes:
+        expression -- the normalized expression, 1d20+5
+        dice -- list of (number, size) for each dice in the expression
+        modifiers -- modifiers for each dice, (('explode', None), ('keep', 3))
+        tree -- root node of the AST
+        evaluate -- closure that takes the total of each dice and returns the result
+        left_side -- for skill checks, closure that returns the left side of the comparison
+    """
+    def __init__(self, expression, dice_tokens, tree):
+        self.expression = expression
+        self.dice = [t.value for t in dice_tokens]
+        self.modifiers = [t.modifiers for t in dice_tokens]
+        self.tree = tree
+        self.evaluate = tree.compile()
+        self.left_side = None
+        if isinstance(tree, Comparison) and len(tree.ops) == 1:
+            self.left_side = tree.operands[0].compile()
+
+        # Text between each dice, used by the renderer to rebuild the expression with the rolls filled in
+        self.segments = []
+        prev = 0
+        for t in dice_tokens:
+            self.segments.append(expression[prev:t.start])
+            prev = t.end
+        self.segments.append(expression[prev:])
+
+    def is_check(self):
+        return self.left_side is not None
+
+    def roll(self, roll_dice):
+        """
+        Rolls every dice using roll_dice(number, size) -> list of ints or DicePool
+
+        Returns the list of rolls for each dice and the result of the expression
+        """
+        rolls = []
+        for (number, size), mods in zip(self.dice, self.modifiers):
+            r = roll_dice(number, size)
+            if mods: # Explode and reroll never redraw more dice than were rolled, so the redraws are lists too
+                r = apply_modifiers(r, mods, size, lambda n, size = size: roll_dice(n, size))
+            rolls.append(r)
+        return rolls, self.evaluate([total_of(r) for r in rolls])
+
+    def roll_batch(self, count, roll_matrix):
+        """
+        Rolls the expression count times at once using roll_matrix(number, size, count) -> (count, number) array
+
+        Dice whose sum could overflow int64 are added up as python ints in an object array
+
+        Returns the total of each dice as arrays and an array with the result of each roll
+        """
+        totals = []
+        for (number, size), mods in zip(self.dice, self.modifiers):
+            rolls = roll_matrix(number, size, count)
+            if mods:
+                rolls = apply_modifiers_batch(rolls, mods, size, lambda n, size = size: roll_matrix(n, size, 1)[0])
+            totals.append(rolls.sum(axis=1) if number * size < BATCH_LIMIT else rolls.astype(object).sum(axis=1))
+
+        try:
+            result = self.evaluate(totals)
+        except ValueError: # Chained comparisons need a single True or False
+            raise DiceParseError(self.expression, "Invalid comparison", "Chained comparisons can not be rolled more than once at a time.")
+        if self.is_check() and isinstance(result, np.ndarray):
+            result = result.astype(bool) # Comparisons of object arrays are objects too
+        return totals, np.broadcast_to(result, (count,))
+
+    def roll_branches(self, branches, roll_matrix):
+        """
+        Rolls the expression branches times for advantage, each dice is one (branches, number)
+        draw and the expression is evaluated once over all branches
+
+        The totals are python ints in an object array, so the arithmetic is exact and division
+        by zero raises the same way as a single roll
+
+        Returns the kept dice of each dice for each branch and the result of each branch
+        """
+        kept = []
+        totals = []
+        for (number, size), mods in zip(self.dice, self.modifiers):
+            rolls = roll_matrix(number, size, branches)
+            if mods:
+                rolls = apply_modifiers_batch(rolls, mods, size, lambda n, size = size: roll_matrix(n, size, 1)[0])
+            kept.append(rolls)
+            totals.append(rolls.sum(axis=1).astype(object))
+
+        try:
+            result = self.evaluate(totals)
+            results = result.tolist() if isinstance(result, np.ndarray) else [result] * branches # No dice, every branch is the same
+        except ValueError: # Chained comparisons need a single True or False, evaluate each branch
+            results = [self.evaluate([t[i] for t in totals]) for i in range(branches)]
+        return [[r[i].tolist() for r in kept] for i in range(branches)], results
+
+def compile_expression(expression):
+    """
+    Parses a normalized expression and compiles it
+
+    Raises:
+        DiceParseError
+    """
+    parser = Parser(expression)
+    tree = parser.parse()
+    return CompiledExpression(expression, parser.dice, tree)
@@ -0,0 +1,155 @@
+import numpy as np
+
+from _dice.Tokenizer import DiceParseError
+from _dice.Modifiers import MAX_EXPLOSIONS
+from _dice.RandomPool import random_pool
+
+POOL_THRESHOLD = 1000 # Rolls with more dice than this are summarized instead of listed
+MAX_MULTINOMIAL_FACES = 10000 # Largest dice that is sampled by counting faces
+MAX_DICE = 10 ** 9 # Limit on the number of dice when faces are counted, cost does not depend on it
+MAX_CHUNKED_DICE = 10 ** 7 # Limit on the number of dice when they have to be drawn in chunks
+MAX_LISTED_DICE = 100000 # Limit on the number of dice when every roll has to be kept
+CHUNK = 10 ** 6 # Dice drawn at a time in chunked mode
+MAX_CHUNKED_SIZE = (2 ** 63 - 1) // CHUNK # Above this the sum of a chunk could overflow int64
+
+def max_dice(size):
+    """
+    Largest number of dice of this size that can be rolled at once
+    """
+    if size <= MAX_MULTINOMIAL_FACES:
+        return MAX_DICE
+    if size <= MAX_CHUNKED_SIZE:
+        return MAX_CHUNKED_DICE
+    return MAX_LISTED_DICE
+
+def total_of(rolls):
+    """
+    Total of a list of rolls, a DicePool or KeptRolls
+    """
+    if isinstance(rolls, list):
+        return sum(rolls)
+    return rolls.total
+
+class DicePool:
+    """
+    Summary of a large number of dice that never builds a list with one entry per die
+
+    Attributes:
+        number -- number of dice rolled
+        size -- size of the dice
+        total -- sum of every die
+        highest -- number of dice that rolled the maximum (crits on a d20)
+        lowest -- number of dice that rolled a 1
+        counts -- how many dice rolled each face, counts[0] is the number of 1s. None for dice too large to count.
+        rng -- generator the pool was rolled with, modifiers that roll again keep using it
+    """
+    def __init__(self, number, size, total, highest, lowest, counts = None, dropped = 0, rng = None):
+        self.number = number
+        self.size = size
+        self.total = total
+        self.highest = highest
+        self.lowest = lowest
+        self.counts = counts
+        self.dropped = dropped
+        self.rng = rng
+
+    @classmethod
+    def sample(cls, number, size, rng = None):
+        """
+        Rolls number dice of size size.
+
+        Small dice draw the count of each face from a multinomial, which takes the same time for
+        a thousand dice as for a billion. Larger dice are drawn in chunks and only the sum and
+        the number of 1s and max rolls are kept.
+
+        rng defaults to the random pool's generator.
+        """
+        rng = rng or random_pool.rng
+        if size <= MAX_MULTINOMIAL_FACES:
+            counts = rng.multinomial(number, np.full(size, 1.0 / size))
+            total = int(np.dot(counts, np.arange(1, size + 1, dtype=np.int64)))
+            return cls(number, size, total, int(counts[-1]), int(counts[0]), counts, rng = rng)
+
+        total = highest = lowest = 0
+        remaining = number
+        while remaining:
+            n = min(remaining, CHUNK)
+            rolls = rng.integers(1, size + 1, n, dtype=np.int64)
+            if size <= MAX_CHUNKED_SIZE:
+                total += int(rolls.sum())
+            else: # The chunk sum could overflow, let python add them
+                total += sum(rolls.tolist())
+            highest += int(np.count_nonzero(rolls == size))
+            lowest += int(np.count_nonzero(rolls == 1))
+            remaining -= n
+        return cls(number, size, total, highest, lowest, rng = rng)
+
+    def require_counts(self, modifier):
+        if self.counts is None:
+            raise DiceParseError(f"{self.number}d{self.size}", "Invalid modifier", f"{modifier} modifiers are limited to {POOL_THRESHOLD:,} dice larger than d{MAX_MULTINOMIAL_FACES} or dice that explode.")
+
+    def from_counts(self, counts):
+        total = int(np.dot(counts, np.arange(1, self.size + 1, dtype=np.int64)))
+        return DicePool(self.number, self.size, total, int(counts[-1]), int(counts[0]), counts, self.dropped, self.rng)
+
+    def reroll(self, below):
+        """
+        Returns a new pool where every dice that rolled below or equal to below was rolled again once
+        """
+        self.require_counts("Reroll")
+        counts = self.counts.copy()
+        rerolled = int(counts[:below].sum())
+        counts[:below] = 0
+        counts += (self.rng or random_pool.rng).multinomial(rerolled, np.full(self.size, 1.0 / self.size))
+        return self.from_counts(counts)
+
+    def minimum(self, face):
+        """
+        Returns a new pool where every dice that rolled below face counts as face
+        """
+        self.require_counts("Minimum")
+        counts = self.counts.copy()
+        counts[face - 1] += counts[:face - 1].sum()
+        counts[:face - 1] = 0
+        return self.from_counts(counts)
+
+    def explode(self):
+        """
+        Returns a new pool where every dice that rolled the highest face was rolled again and
+        added, until it stops rolling the highest face. Only the total changes, so the pool
+        no longer has counts and can not be kept or dropped afterwards.
+        """
+        self.require_counts("Exploding")
+        total = self.total
+        exploding = int(self.counts[-1])
+        for _ in range(MAX_EXPLOSIONS):
+            if not exploding:
+                break
+            counts = (self.rng or random_pool.rng).multinomial(exploding, np.full(self.size, 1.0 / self.size))
+            total += int(np.dot(counts, np.arange(1, self.size + 1, dtype=np.int64)))
+            exploding = int(counts[-1])
+        return DicePool(self.number, self.size, total, self.highest, self.lowest, None, self.dropped, self.rng)
+
+    def keep(self, drop, lowest = True):
+        """
+        Returns a new pool without the drop lowest (or highest) dice
+        """
+        self.require_counts("Keep and drop")
+
+        drop = min(drop, self.number)
+        counts = self.counts if lowest else self.counts[::-1]
+        before = np.cumsum(counts) - counts # Dice with a lower face than each face
+        removed = np.minimum(counts, np.maximum(drop - before, 0))
+        counts = counts - removed
+        if not lowest:
+            counts = counts[::-1]
+
+        total = int(np.dot(counts, np.arange(1, self.size + 1, dtype=np.int64)))
+        return DicePool(self.number - drop, self.size, total, int(counts[-1]), int(counts[0]), counts, self.dropped + drop, self.rng)
+
+    def __str__(self):
+        dropped = f", dropped {self.dropped:,}" if self.dropped else ""
+        return f"[{self.number:,} dice: {self.highest:,} rolled {self.size:,}, {self.lowest:,} rolled 1{dropped}]"
+
+    def __repr__(self):
+        return f"DicePool({self.number}d{self.size}, total={self.total})"
@@ -0,0 +1,116 @@
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+COMMON_SIZES = (4, 6, 8, 10, 12, 20, 100) # Dice that get a pre-drawn buffer
+BLOCK_SIZE = 1 << 16 # Rolls drawn at a time for each size
+SINGLE_CHUNK = 1024 # Rolls converted to python ints at a time for single dice
+
+class RollBuffer:
+    """
+    Pre-drawn rolls for one dice size. Rolls are handed out as slices of the current block,
+    while the next block is drawn on a background thread.
+
+    Single rolls are served from a chunk of the block converted to a list of python ints. next()
+    on a list iterator is atomic, so a single roll needs no lock and no numpy scalar.
+    """
+    def __init__(self, size, rng, executor, block_size = BLOCK_SIZE):
+        self.size = size
+        self.rng = rng
+        self.executor = executor
+        self.block_size = block_size
+        self.lock = threading.Lock()
+
+        self.block = self.draw()
+        self.pos = 0
+        self.next = self.executor.submit(self.draw)
+        self.singles = iter(())
+
+    def draw(self):
+        return self.rng.integers(1, self.size + 1, self.block_size, dtype=np.int64)
+
+    def swap(self):
+        """
+        Moves to the next block and starts drawing the one after it
+        """
+        self.block = self.next.result()
+        self.pos = 0
+        self.next = self.executor.submit(self.draw)
+
+    def take(self, n):
+        """
+        Returns an array of n rolls, n must not be larger than the block size
+        """
+        with self.lock:
+            if self.pos + n > self.block_size:
+                self.swap()
+            rolls = self.block[self.pos:self.pos + n]
+            self.pos += n
+        return rolls
+
+    def take_one(self):
+        try:
+            return next(self.singles)
+        except StopIteration: # Two threads may both refill, one chunk is then discarded
+            self.singles = iter(self.take(min(SINGLE_CHUNK, self.block_size)).tolist())
+            return next(self.singles)
+
+class RandomPool:
+    """
+    Per process pool of pre-drawn rolls for common dice sizes. Each size has its own generator,
+    so the rolls for a size only depend on the seed and not on when blocks were refilled.
+
+    Uncommon sizes and rolls larger than a block are drawn directly.
+    """
+    def __init__(self, sizes = COMMON_SIZES, block_size = BLOCK_SIZE, seed = None):
+        self.sizes = sizes
+        self.block_size = block_size
+        self.executor = ThreadPoolExecutor(max_workers = 1, thread_name_prefix = "RandomPool")
+        self.seed(seed)
+
+    def restart(self, seed = None):
+        """
+        Starts a new refill thread and reseeds, used in forked processes where the old thread no longer exists
+        """
+        self.executor = ThreadPoolExecutor(max_workers = 1, thread_name_prefix = "RandomPool")
+        self.seed(seed)
+
+    def seed(self, seed = None):
+        """
+        Discards every buffer and draws new ones from seed, None uses fresh entropy
+        """
+        sequence = np.random.SeedSequence(seed)
+        children = sequence.spawn(len(self.sizes) + 1)
+        self.rng = np.random.default_rng(children[0]) # Used for sizes without a buffer
+        self.buffers = {size: RollBuffer(size, np.random.default_rng(child), self.executor, self.block_size)
+                        for size, child in zip(self.sizes, children[1:])}
+
+    def roll(self, size, number = 1):
+        """
+        Rolls number dice of size size and returns the rolls as a list of ints
+        """
+        buffer = self.buffers.get(size)
+        if buffer is not None and number <= self.block_size:
+            return buffer.take(number).tolist()
+        return self.rng.integers(1, size + 1, number, dtype=np.int64).tolist()
+
+    def matrix(self, size, number, count):
+        """
+        Rolls number dice of size size count times as a (count, number) array. The array may be a
+        view of a buffer, it must not be changed in place.
+        """
+        buffer = self.buffers.get(size)
+        if buffer is not None and number * count <= self.block_size:
+            return buffer.take(number * count).reshape(count, number)
+        return self.rng.integers(1, size + 1, (count, number), dtype=np.int64)
+
+    def randint(self, size):
+        """
+        Rolls a single dice
+        """
+        buffer = self.buffers.get(size)
+        if buffer is not None:
+            return buffer.take_one()
+        return int(self.rng.integers(1, size + 1))
+
+random_pool = RandomPool()
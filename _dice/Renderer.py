@@ -0,0 +1,263 @@
+import heapq
+import numpy as np
+
+from _dice.Modifiers import KeptRolls, ELVEN_ACCURACY
+
+SORRY_MSG = "```I'm sorry, there was something I didnt understand about your input. See !help roll for more info```"
+TIMEOUT_MSG = "```I'm sorry, that roll took too long so I stopped it. Try using fewer or smaller dice.```"
+ODDS_TIMEOUT_MSG = "```I'm sorry, calculating those odds took too long so I stopped it. Try using fewer or smaller dice.```"
+BREAKDOWN_BUDGET = 100 # Longest roll breakdown that is shown in full
+SUMMARY_DICE = 10 # When the breakdown is too long, dice with more rolls than this are summarized
+HISTOGRAM_FACES = 20 # Largest dice summarized with a count of each face, larger dice show the highest and lowest rolls
+
+def format_total(t):
+    if float(t).is_integer():
+        return str(t)
+    return "%.2f" % t
+
+def roll_pieces(rolls):
+    """
+    Yields str(rolls) a piece at a time so rendering can stop as soon as it is too long
+    """
+    if isinstance(rolls, KeptRolls):
+        yield from roll_pieces(rolls.kept)
+        if rolls.dropped:
+            yield ' (dropped '
+            for i, r in enumerate(rolls.dropped):
+                yield (', ' if i else '') + str(r)
+            yield ')'
+    elif isinstance(rolls, list):
+        yield '['
+        for i, r in enumerate(rolls):
+            yield (', ' if i else '') + str(r)
+        yield ']'
+    else: # DicePool, already a summary
+        yield str(rolls)
+
+def breakdown_pieces(expression, rolls):
+    yield expression.segments[0]
+    for r, segment in zip(rolls, expression.segments[1:]):
+        yield from roll_pieces(r)
+        yield segment
+
+def render_breakdown(expression, rolls, budget = BREAKDOWN_BUDGET):
+    """
+    Rebuilds a CompiledExpression with the rolls filled in, 1d20+5 -> [14]+5
+
+    Stops as soon as the breakdown is longer than budget and returns a summary instead, so
+    large rolls never turn every dice into a string.
+    """
+    parts = []
+    length = 0
+    for piece in breakdown_pieces(expression, rolls):
+        length += len(piece)
+        if length > budget:
+            return summarize_breakdown(expression, rolls)
+        parts.append(piece)
+    return ''.join(parts)
+
+def summarize_breakdown(expression, rolls):
+    """
+    8d6+60d6 -> [2, 6, 3, 1, 4, 4, 6, 2]+[60 dice: 1x9 2x12 3x8 4x11 5x10 6x10]
+    40d100 -> [40 dice: highest 99, 88, 85, lowest 1, 1, 3]
+    """
+    parts = [expression.segments[0]]
+    for (number, size), r, segment in zip(expression.dice, rolls, expression.segments[1:]):
+        parts.append(summarize_rolls(r, size))
+        parts.append(segment)
+    return ''.join(parts)
+
+def summarize_rolls(rolls, size):
+    if not isinstance(rolls, (list, KeptRolls)): # DicePool
+        return str(rolls)
+
+    dropped = ""
+    if isinstance(rolls, KeptRolls):
+        dropped = f", dropped {len(rolls.dropped)}" if rolls.dropped else ""
+        rolls = rolls.kept
+
+    if len(rolls) <= SUMMARY_DICE:
+        return f"[{', '.join(str(r) for r in rolls)}{dropped}]"
+
+    if size <= HISTOGRAM_FACES:
+        counts = np.bincount(rolls, minlength = size + 1)[1:]
+        body = ' '.join(f"{face}x{count}" for face, count in enumerate(counts.tolist(), 1) if count)
+    else:
+        highest = ', '.join(str(r) for r in heapq.nlargest(3, rolls))
+        lowest = ', '.join(str(r) for r in heapq.nsmallest(3, rolls))
+        body = f"highest {highest}, lowest {lowest}"
+    return f"[{len(rolls)} dice: {body}{dropped}]"
+
+def advantage_name(adv, disadv):
+    if adv == ELVEN_ACCURACY:
+        return "elven accuracy"
+    return "advantage" if adv else "disadvantage" if disadv else ""
+
+def render_advantage(adv, disadv, rES, totals, chance = None):
+    """
+    Constructs the return string where rES is the original expression and totals are the totals of every roll.
+    chance is the exact chance a skill check succeeds with advantage or disadvantage.
+    """
+    odds = chance_line(chance)
+    name = advantage_name(adv, disadv)
+    final = max(totals) if adv else min(totals)
+    outMsg = f'''```diff
+I interpreted your input as {rES} with {name}.
+Totals: {' & '.join(f"[{t}]" for t in totals)}{odds}
+- You rolled [{final}] with {name} -```'''
+
+    return outMsg
+
+def chance_line(chance):
+    if chance is None:
+        return ""
+    return f"\nChance of success: {100 * chance:.2f}%"
+
+def render_roll(rES, uES, t, chance = None):
+    """
+    Constructs the return string where rES is the original expression, uES is the roll breakdown from render_breakdown, and t is the total.
+    chance is the exact chance a skill check succeeds.
+    """
+    if(type(t) is bool):
+        if(t):
+            outMsg = f'''```diff
+I interpreted your input as {rES}.
+Rolls: {uES}{chance_line(chance)}
+- Ability/Skill Check: Succeeded -```'''
+        else:
+            outMsg = f'''```diff
+I interpreted your input as {rES}.
+Rolls: {uES}{chance_line(chance)}
+- Ability/Skill Check: Failed -```'''
+
+    else:
+        outMsg = f'''```diff
+I interpreted your input as {rES}.
+Rolls: {uES}
+- Total: {format_total(t)} -```'''
+
+    return outMsg
+
+def render_roll_no_format(rES, uES, t, chance = None):
+    """
+    Same as render_roll without the code block, used for GM rolls
+    """
+    if(type(t) is bool):
+        if(t):
+            outMsg = f'''I interpreted your input as {rES}.
+Rolls: {uES}{chance_line(chance)}
+[Ability/Skill Check: Succeeded]'''
+        else:
+            outMsg = f'''I interpreted your input as {rES}.
+Rolls: {uES}{chance_line(chance)}
+[Ability/Skill Check: Failed]'''
+
+    else:
+        outMsg = f'''
+I interpreted your input as {rES}.
+Rolls: {uES}
+- Total: {format_total(t)} -'''
+
+    return outMsg
+
+def render_distribution(adv, disadv, rES, dist):
+    """
+    Constructs the return string where rES is the original expression and dist is its Distribution
+    """
+    def fmt(v):
+        v = v.item() if hasattr(v, 'item') else v
+        if isinstance(v, float) and not v.is_integer():
+            return "%.2f" % v
+        return str(int(v))
+
+    flag = f" with {advantage_name(adv, disadv)}" if adv or disadv else ""
+    totals = dist.compared if dist.is_check() and dist.compared is not None else dist
+    percentiles = ' | '.join(f"{q}th: {fmt(totals.percentile(q))}" for q in (10, 25, 50, 75, 90))
+
+    outMsg = f'''```diff
+I interpreted your input as {rES}{flag}.
+Average: {"%.2f" % totals.mean()} | Std. Dev: {"%.2f" % totals.std()}
+Min: {fmt(totals.values[0])} | Max: {fmt(totals.values[-1])}
+Percentiles: {percentiles}'''
+
+    if dist.is_check():
+        outMsg += f'''
+- Chance of success: {"%.2f" % (100 * dist.success())}% -```'''
+    else:
+        outMsg += "```"
+
+    return outMsg
+
+def render_inline(results):
+    """
+    Constructs one message for every inline roll of a chat message, results is a list of
+    (expression, breakdown, total) where breakdown is None if the expression could not be rolled
+    """
+    lines = []
+    for expression, breakdown, t in results:
+        if breakdown is None:
+            lines.append(f"[[{expression}]] I didn't understand this roll")
+        elif type(t) is bool:
+            lines.append(f"[[{expression}]] {breakdown} - {'Succeeded' if t else 'Failed'}")
+        else:
+            lines.append(f"[[{expression}]] {breakdown} = {format_total(t)}")
+
+    newline = '\n'
+    outMsg = f'''```diff
+{newline.join(lines)}```'''
+    return outMsg
+
+def add_roll_id(outMsg, roll_id):
+    """
+    Adds the id of an audited roll to the end of a rendered roll, inside its code block if it has one
+    """
+    if outMsg.endswith("```"):
+        return outMsg[:-3] + f"\nRoll id: {roll_id}```"
+    return outMsg + f"\nRoll id: {roll_id}"
+
+def render_verify(roll_id, when, logged, text = None, uES = None, t = None, matches = None):
+    """
+    Constructs the return string of !roll verify. logged is the total in the audit log, text is the
+    expression that was checked, uES and t are the breakdown and total of rolling it again.
+    """
+    logged = int(logged) if logged.is_integer() else logged # The log stores every total as a float
+    outMsg = f'''```diff
+Roll {roll_id} was made at {when} with a total of {format_total(logged)}.'''
+
+    if text is None:
+        outMsg += "\nAdd the expression that was rolled to check the dice, Ex: !roll verify " + str(roll_id) + " 1d20+5```"
+    elif uES is None:
+        outMsg += f"\n- Roll {roll_id} was not {text} -```"
+    elif matches:
+        outMsg += f"\nRolls: {uES}\n+ Verified: rolling {text} again from its stream gives {format_total(t)} +```"
+    else:
+        outMsg += f"\nRolls: {uES}\n- Not verified: rolling {text} again from its stream gives {format_total(t)} -```"
+    return outMsg
+
+def render_dpr(request, label, chance, crit, mean, std, simulated = None):
+    """
+    Constructs the return string of !dpr, one line per armor class. chance, crit, mean and std are
+    arrays with one entry per armor class, simulated is (mean, std) from a simulation or None.
+    """
+    flag = f" with {advantage_name(request.advantage, request.disadvantage)}" if bool(request.advantage) != request.disadvantage else ""
+    attacks = f", {request.attacks} attacks per round" if request.attacks > 1 else ""
+    crits = f", critical hits on {request.crit}-20" if request.crit < 20 else ""
+
+    lines = []
+    for i, ac in enumerate(request.acs.tolist()):
+        line = f"AC {ac:>2} | Hit {100 * chance[i]:6.2f}% | Crit {100 * crit[i]:5.2f}% | {mean[i]:.2f} ± {std[i]:.2f}"
+        if simulated is not None:
+            line += f" (simulated {simulated[0][i]:.2f} ± {simulated[1][i]:.2f})"
+        lines.append(line)
+
+    newline = '\n'
+    outMsg = f'''```diff
+I interpreted your input as {label}, {request.bonus:+d} to hit{flag}{attacks}{crits}.
+Damage per round:
+{newline.join(lines)}'''
+
+    if len(request.acs) == 1:
+        outMsg += f"\n- Expected damage per round: {mean[0]:.2f} -```"
+    else:
+        outMsg += f"\n- Expected damage per round: {mean.min():.2f} to {mean.max():.2f} -```"
+    return outMsg
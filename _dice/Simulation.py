@@ -0,0 +1,148 @@
+import secrets
+import numpy as np
+
+from _dice.Engine import compile_chain, sample_chain, check_limits, stream_matrix
+from _dice.Audit import stream
+from _dice.Tokenizer import DiceParseError
+
+DEFAULT_TRIALS = 1000000
+MAX_TRIALS = 10 ** 7
+CHUNK_DICE = 2 * 10 ** 6 # Dice rolled per chunk, bounds memory no matter how many trials are run
+CHUNK_TRIALS = 100000 # Most trials per chunk, so progress is shown regularly
+MIN_TRIALS = 20000 # Trials before stopping early is considered
+Z = 1.96 # 95% confidence interval
+RELATIVE_TOLERANCE = 0.005 # Stop once the confidence interval is within 0.5% of the mean
+ABSOLUTE_TOLERANCE = 0.0025 # or within 0.0025, for success rates and means close to 0
+SPARK = '▁▂▃▄▅▆▇█'
+BINS = 24
+
+class Simulation:
+    """
+    Monte Carlo simulation of a dice expression, including then and count statements.
+    Trials are run in chunks with step() and the statistics are updated after each chunk.
+
+    Attributes:
+        expression -- the normalized expression
+        trials -- number of trials requested
+        done -- number of trials run so far
+        mean, m2 -- running mean and sum of squared differences, merged per chunk
+        low, high -- smallest and largest value seen
+        edges, hist -- histogram of the values, the range is set by the first chunk
+        key, chunks -- chunk i draws from stream(key, i), so chunks never share a generator and could run anywhere
+    """
+    def __init__(self, inp, trials = DEFAULT_TRIALS):
+        self.expression, self.chain, self.count = compile_chain(inp)
+        for c in self.chain:
+            if c != 't':
+                limit = check_limits(c)
+                if limit:
+                    raise DiceParseError(self.expression, "Expression too large", limit)
+
+        self.trials = min(trials, MAX_TRIALS)
+        self.is_check = len(self.chain) == 1 and self.chain[0].is_check()
+
+        dice = sum(number for c in self.chain if c != 't' for number, _ in c.dice) * self.count
+        if dice > CHUNK_DICE: # A single trial would not fit in a chunk
+            raise DiceParseError(self.expression, "Expression too large", f"A simulation can roll at most {CHUNK_DICE:,} dice per trial.")
+        self.chunk = max(1, min(CHUNK_DICE // max(dice, 1), CHUNK_TRIALS, self.trials))
+
+        self.done = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.low = None
+        self.high = None
+        self.edges = None
+        self.hist = np.zeros(BINS, dtype=np.int64)
+        self.key = secrets.randbits(64)
+        self.chunks = 0
+
+    def step(self):
+        """
+        Runs one chunk of trials and merges it into the running statistics
+        """
+        n = min(self.chunk, self.trials - self.done)
+        values = sample_chain(self.chain, self.count, n, stream_matrix(stream(self.key, self.chunks)))
+        self.chunks += 1
+
+        # Chan et al. parallel merge of mean and variance
+        mean = values.mean()
+        m2 = ((values - mean) ** 2).sum()
+        delta = mean - self.mean
+        total = self.done + n
+        self.mean += delta * n / total
+        self.m2 += m2 + delta ** 2 * self.done * n / total
+        self.done = total
+
+        low, high = values.min(), values.max()
+        self.low = low if self.low is None else min(self.low, low)
+        self.high = high if self.high is None else max(self.high, high)
+
+        if self.edges is None:
+            self.edges = self.bin_edges(values, low, high)
+        bins = len(self.edges) - 1
+        idx = np.clip(np.searchsorted(self.edges, values, side = 'right') - 1, 0, bins - 1) # Values outside the first range go in the end bins
+        self.hist[:bins] += np.bincount(idx, minlength = bins)
+
+    def bin_edges(self, values, low, high):
+        """
+        Histogram bins covering low to high. Whole number results get bins that are a whole
+        number wide, so no bin is empty only because it falls between two possible values.
+        """
+        if np.array_equal(values, np.round(values)):
+            low, high = int(low), int(high) # Python ints, float rounding of large values could make an extra bin
+            width = max(1, -(-(high - low + 1) // BINS))
+            bins = min((high - low) // width + 1, BINS)
+            return low - 0.5 + width * np.arange(bins + 1, dtype=np.float64)
+        return np.linspace(low, high if high > low else low + 1, BINS + 1)
+
+    def std(self):
+        return float(np.sqrt(self.m2 / (self.done - 1))) if self.done > 1 else 0.0
+
+    def half_width(self):
+        """
+        Half width of the 95% confidence interval of the mean
+        """
+        return Z * self.std() / np.sqrt(self.done) if self.done else float('inf')
+
+    def converged(self):
+        return self.done >= MIN_TRIALS and self.half_width() <= max(RELATIVE_TOLERANCE * abs(self.mean), ABSOLUTE_TOLERANCE)
+
+    def finished(self):
+        return self.done >= self.trials or self.converged()
+
+    def sparkline(self):
+        hist = self.hist[:len(self.edges) - 1] if self.edges is not None else self.hist
+        if not hist.any():
+            return ""
+        levels = np.ceil(hist / hist.max() * (len(SPARK) - 1)).astype(int)
+        return ''.join(SPARK[l] for l in levels)
+
+    def report(self, stopped = None):
+        """
+        Constructs the progress message, stopped is a reason the simulation ended before all trials ran
+        """
+        def fmt(v):
+            return str(int(v)) if float(v).is_integer() else "%.2f" % v
+
+        if self.finished() and self.done < self.trials:
+            status = " (stopped early, the result is precise enough)"
+        elif stopped:
+            status = f" ({stopped})"
+        else:
+            status = "" if self.finished() else " ..."
+
+        outMsg = f'''```diff
+Simulating {self.expression}
+Trials: {self.done:,} of {self.trials:,}{status}
+'''
+        if not self.done:
+            return outMsg + "```"
+
+        if self.is_check:
+            outMsg += f"- Chance of success: {100 * self.mean:.2f}% ± {100 * self.half_width():.2f}% -```"
+            return outMsg
+
+        outMsg += f'''Average: {self.mean:.2f} ± {self.half_width():.2f} (95% CI) | Std. Dev: {self.std():.2f}
+Min: {fmt(self.low)} | Max: {fmt(self.high)}
+{self.sparkline()}```'''
+        return outMsg
@@ -0,0 +1,99 @@
+import re
+
+from _dice.Modifiers import KEEP_MODIFIERS, FACE_MODIFIERS
+
+class DiceParseError(Exception):
+    """Exception raised for errors in dice expressions
+
+    Attributes:
+        expression -- input expression which caused the error
+        exception_type -- short description of the error
+        message -- explanation of the error
+    """
+
+    def __init__(self, expression, exception_type, message):
+        self.expression = expression
+        self.exception_type = exception_type
+        self.message = message
+        super().__init__(self.message)
+
+class Token:
+    def __init__(self, kind, text, start, end, value = None, modifiers = ()):
+        self.kind = kind # 'dice', 'number', 'slot', 'op' or 'end'
+        self.text = text
+        self.start = start
+        self.end = end
+        self.value = value # (number, size) for dice, int/float for numbers, index for slots
+        self.modifiers = modifiers # Modifiers of a dice, (('explode', None), ('keep', 3))
+
+    def __repr__(self):
+        return f"Token({self.kind}, {self.text!r})"
+
+# Dice must come before numbers so 1d20 is not read as the number 1
+_TOKEN_RE = re.compile(r"(?P<dice>(\d*)d(\d+)(?P<mods>(?:(?:kh|kl|dh|dl|k|r<|min)\d*|!)*))|(?P<number>\d+\.?\d*|\.\d+)|(?P<op>\*\*|//|<=|>=|==|=|[-+*/%<>()])")
+_MODIFIER_RE = re.compile(r"(kh|kl|dh|dl|k|r<|min|!)(\d*)")
+
+def normalize(expression):
+    """
+    Normalizes an expression so equivalent inputs share a cache entry
+
+    ' 1D20 + 5 ' -> '1d20+5'
+    """
+    return ''.join(expression.lower().replace('\\', '').split())
+
+def tokenize(expression):
+    """
+    Splits a normalized expression into tokens
+
+    1d20+5 -> [Token(dice, '1d20'), Token(op, '+'), Token(number, '5'), Token(end, '')]
+    """
+    tokens = []
+    pos = 0
+    while pos < len(expression):
+        m = _TOKEN_RE.match(expression, pos)
+        if m is None:
+            raise DiceParseError(expression, "Invalid character", f"I didn't understand {expression[pos]} at index {pos}.")
+
+        if m.group('dice'):
+            number = int(m.group(2)) if m.group(2) else 1 # d20 -> 1d20
+            size = int(m.group(3))
+            if size < 1:
+                raise DiceParseError(expression, "Invalid dice size", f"{m.group('dice')} is not a valid dice because it has no sides.")
+            tokens.append(Token('dice', m.group(0), m.start(), m.end(), (number, size), modifiers(expression, m.group('mods'), size)))
+
+        elif m.group('number'):
+            text = m.group('number')
+            value = float(text) if '.' in text else int(text)
+            tokens.append(Token('number', text, m.start(), m.end(), value))
+
+        else:
+            op = '==' if m.group('op') == '=' else m.group('op') # 1d20=20 is the same as 1d20==20
+            tokens.append(Token('op', op, m.start(), m.end()))
+
+        pos = m.end()
+
+    tokens.append(Token('end', '', pos, pos))
+    return tokens
+
+def modifiers(expression, text, size):
+    """
+    Reads the modifiers that follow a dice of size size
+
+    'kh3' -> (('keep', 3),)
+    '!r<2' -> (('explode', None), ('reroll', 2))
+    """
+    mods = []
+    for flag, count in _MODIFIER_RE.findall(text):
+        if flag == '!':
+            if size == 1:
+                raise DiceParseError(expression, "Invalid exploding dice", "A d1 would explode forever.")
+            mods.append((FACE_MODIFIERS[flag], None))
+        elif not count:
+            if flag in FACE_MODIFIERS:
+                raise DiceParseError(expression, "Invalid modifier", f"The face was not specified after {flag}.")
+            raise DiceParseError(expression, "Invalid keep count", f"The number of dice to keep or drop was not specified after {flag}.")
+        elif flag == 'min' and int(count) > size:
+            raise DiceParseError(expression, "Invalid modifier", f"min{count} is higher than the highest face of a d{size}.")
+        else:
+            mods.append((FACE_MODIFIERS.get(flag) or KEEP_MODIFIERS[flag], int(count)))
+    return tuple(mods)
@@ -0,0 +1,57 @@
+"""
+Compares the arithmetic evaluator in _dice.Arithmetic against the old asteval path.
+
+The asteval path is what the dice rollers used to do: join the rolled numbers and
+operators into a string and evaluate it with asteval.Interpreter.
+
+Run from the repository root:
+    python benchmarks/bench_arithmetic.py
+"""
+import sys
+import timeit
+from os import path
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+from _dice.Arithmetic import evaluate
+from _dice.ExpressionCache import ExpressionCache
+
+try:
+    from asteval import Interpreter
+except ImportError:
+    Interpreter = None
+
+# (items after rolling, original expression)
+CASES = [
+    ([14, '+5'], "1d20+5"),
+    ([14, '+5>=', '15'], "1d20+5>=15"),
+    ([9, '+', 3, '*2'], "2d6+1d4*2"),
+    (['(', 3, '+1)*', 7, '/3-1'], "(1d4+1)*2d6/3-1"),
+]
+
+def asteval_path(aeval, items):
+    return aeval(''.join(str(i) for i in items))
+
+def main(number = 20000):
+    cache = ExpressionCache()
+    aeval = Interpreter() if Interpreter else None
+
+    print(f"{'expression':<20} {'asteval':>14} {'evaluate':>14} {'compiled':>14}")
+    for items, expression in CASES:
+        compiled = cache.get(expression)
+        totals = [i for i in items if not isinstance(i, str)]
+
+        if aeval:
+            assert asteval_path(aeval, items) == evaluate(items) == compiled.evaluate(totals)
+            t_asteval = timeit.timeit(lambda: asteval_path(aeval, items), number = number)
+            asteval_ops = f"{number / t_asteval:,.0f}/s"
+        else:
+            asteval_ops = "n/a"
+
+        t_evaluate = timeit.timeit(lambda: evaluate(items), number = number)
+        t_compiled = timeit.timeit(lambda: compiled.evaluate(totals), number = number)
+
+        print(f"{expression:<20} {asteval_ops:>14} {number / t_evaluate:>12,.0f}/s {number / t_compiled:>12,.0f}/s")
+
+if __name__ == "__main__":
+    main()
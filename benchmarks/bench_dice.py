@@ -0,0 +1,215 @@
+"""
+Throughput, latency and allocations of the dice engine over the pinned corpus in corpus.txt.
+
+Every case is timed one call at a time for ops/sec, p50 and p99, then run again under
+tracemalloc for the peak memory a single call allocates. The RandomPool is seeded before
+each case so every run rolls the same dice.
+
+Run from the repository root:
+    python benchmarks/bench_dice.py
+    python benchmarks/bench_dice.py --save main        # writes benchmarks/baselines/main.json
+    python benchmarks/bench_dice.py --compare main     # shows the change against a saved baseline
+
+Or with pytest-benchmark:
+    python -m pytest benchmarks/bench_dice.py --benchmark-only
+"""
+import argparse
+import asyncio
+import atexit
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from os import path
+
+import numpy as np
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+from _dice import Engine
+from _dice.Audit import AuditLog
+from _dice.RandomPool import random_pool
+from _classes.RollHistory import RollHistory
+
+CORPUS_PATH = path.join(path.dirname(path.abspath(__file__)), 'corpus.txt')
+BASELINE_DIR = path.join(path.dirname(path.abspath(__file__)), 'baselines')
+SEED = 2021
+MIN_TIME = 0.2 # Seconds each case is timed for
+MAX_CALLS = 20000
+ALLOC_CALLS = 20 # Calls traced for allocations, tracemalloc is slow
+REGRESSION = 1.2 # A case is flagged when its p50 is this much slower than the baseline
+CHANNEL = 2021 # Channel and user of audited rolls
+USER = 1
+
+class AuditedRoll:
+    """
+    What !roll does in a channel: roll_async with a channel and history, so the dice come from the
+    roll's Philox stream, the roll is written to the audit log and added to the channel's history.
+
+    The audit log is a temporary file, created on first use and deleted at exit, so the bot's
+    own roll log is never written. Each call runs the coroutine on an event loop like the bot does.
+    """
+    def __init__(self):
+        self.loop = None
+        self.history = None
+
+    def start(self):
+        directory = tempfile.mkdtemp(prefix = 'bench_dice')
+        atexit.register(shutil.rmtree, directory, True)
+        Engine.audit_log = AuditLog(path.join(directory, 'rolls.log'), path.join(directory, 'roll_key.txt'))
+        self.loop = asyncio.new_event_loop()
+        self.history = RollHistory()
+
+    def __call__(self, inp):
+        if self.loop is None:
+            self.start()
+        return self.loop.run_until_complete(Engine.roll_async(inp, channel = CHANNEL, history = (self.history, USER)))
+
+KINDS = {
+    'roll': Engine.roll,
+    'audited': AuditedRoll(),
+    'then': Engine.roll_then_count,
+    'single': lambda inp: Engine.roll_single(int(inp.split()[0]), ' '.join(inp.split()[1:]) or None),
+    'inline': lambda inp: Engine.roll_inline(Engine.inline_spans(inp)),
+    'odds': Engine.odds,
+}
+
+class Case:
+    def __init__(self, kind, inp):
+        self.kind = kind
+        self.inp = inp
+        self.name = f"{kind} {inp}"
+        fn = KINDS[kind]
+        self.fn = lambda: fn(inp)
+
+def load_corpus(filename = CORPUS_PATH):
+    cases = []
+    with open(filename) as file:
+        for line in file:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                kind, inp = line.split(' ', 1)
+                cases.append(Case(kind, inp))
+    return cases
+
+def seed():
+    """
+    Seeds the RandomPool and waits for its background refills, so they are not counted as allocations of the case
+    """
+    random_pool.seed(SEED)
+    for buffer in random_pool.buffers.values():
+        buffer.next.result()
+
+def time_case(case, min_time = MIN_TIME, max_calls = MAX_CALLS):
+    """
+    Times single calls until min_time has passed, returns the duration of each call in seconds
+    """
+    case.fn() # Warm up the caches, a bot answers the same expressions many times
+    times = []
+    start = time.perf_counter()
+    while len(times) < max_calls and (time.perf_counter() - start < min_time or len(times) < 5):
+        t = time.perf_counter()
+        case.fn()
+        times.append(time.perf_counter() - t)
+    return np.array(times)
+
+def peak_allocation(case, calls = ALLOC_CALLS):
+    """
+    Memory a single call has allocated at its peak, in bytes. The median of several calls is used
+    so an occasional buffer refill doesn't count against the case.
+    """
+    tracemalloc.start()
+    try:
+        peaks = []
+        for _ in range(calls):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            case.fn()
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    finally:
+        tracemalloc.stop()
+    return int(np.median(peaks))
+
+def run(cases, min_time = MIN_TIME):
+    results = {}
+    for case in cases:
+        seed()
+        times = time_case(case, min_time)
+        seed()
+        results[case.name] = {
+            'calls': len(times),
+            'ops_per_sec': float(len(times) / times.sum()),
+            'p50_us': float(np.percentile(times, 50) * 1e6),
+            'p99_us': float(np.percentile(times, 99) * 1e6),
+            'peak_bytes': peak_allocation(case),
+        }
+    return results
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'system': platform.system(),
+    }
+
+def report(results, baseline = None):
+    print(f"{'case':<48} {'ops/sec':>12} {'p50':>10} {'p99':>10} {'peak alloc':>12}" + (f" {'p50 vs base':>12}" if baseline else ""))
+    for name, r in results.items():
+        line = f"{name[:48]:<48} {r['ops_per_sec']:>12,.0f} {r['p50_us']:>8,.1f}us {r['p99_us']:>8,.1f}us {r['peak_bytes'] / 1024:>9,.1f}KiB"
+        if baseline:
+            old = baseline['results'].get(name)
+            if old:
+                ratio = r['p50_us'] / old['p50_us']
+                line += f" {ratio:>11.2f}x" + (" SLOWER" if ratio > REGRESSION else "")
+            else:
+                line += f" {'new':>12}"
+        print(line)
+
+def baseline_path(name):
+    return path.join(BASELINE_DIR, f"{name}.json")
+
+def main():
+    parser = argparse.ArgumentParser(description = "Benchmarks the dice engine over the pinned corpus")
+    parser.add_argument('--save', metavar = 'NAME', help = "save the results as benchmarks/baselines/NAME.json")
+    parser.add_argument('--compare', metavar = 'NAME', help = "compare against benchmarks/baselines/NAME.json")
+    parser.add_argument('--filter', default = '', help = "only run cases that contain this text")
+    parser.add_argument('--time', type = float, default = MIN_TIME, help = "seconds each case is timed for")
+    args = parser.parse_args()
+
+    cases = [c for c in load_corpus() if args.filter in c.name]
+    results = run(cases, args.time)
+
+    baseline = None
+    if args.compare:
+        with open(baseline_path(args.compare)) as file:
+            baseline = json.load(file)
+    report(results, baseline)
+
+    if args.save:
+        os.makedirs(BASELINE_DIR, exist_ok = True)
+        with open(baseline_path(args.save), 'w') as file:
+            json.dump({'environment': environment(), 'seed': SEED, 'results': results}, file, indent = 2)
+        print(f"\nSaved {baseline_path(args.save)}")
+
+#region pytest-benchmark
+if __name__ != "__main__": # Collected by pytest, a plain pytest run skips the benchmarks without pytest-benchmark
+    import pytest
+    pytest.importorskip("pytest_benchmark")
+
+def pytest_generate_tests(metafunc):
+    if 'case' in metafunc.fixturenames:
+        cases = load_corpus()
+        metafunc.parametrize('case', cases, ids = [c.name for c in cases])
+
+def test_dice(benchmark, case):
+    seed()
+    benchmark(case.fn)
+#endregion
+
+if __name__ == "__main__":
+    main()
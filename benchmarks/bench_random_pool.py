@@ -0,0 +1,43 @@
+"""
+Per-roll latency of the pre-drawn RandomPool against drawing every roll directly.
+
+Run from the repository root:
+    python benchmarks/bench_random_pool.py
+"""
+import random
+import sys
+import timeit
+from os import path
+
+import numpy as np
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+from _dice.RandomPool import RandomPool
+
+# (number of dice, size of dice)
+CASES = [
+    (1, 20),
+    (2, 20),
+    (4, 6),
+    (8, 6),
+    (1, 100),
+    (1, 7), # No buffer, drawn directly
+]
+
+def main(number = 200000):
+    pool = RandomPool()
+
+    print(f"{'dice':<8} {'random.randint':>16} {'np.randint':>16} {'RandomPool':>16}")
+    for n, size in CASES:
+        t_random = timeit.timeit(lambda: [random.randint(1, size) for _ in range(n)], number = number)
+        t_numpy = timeit.timeit(lambda: np.random.randint(1, size + 1, n, dtype=np.int64).tolist(), number = number)
+        if n == 1:
+            t_pool = timeit.timeit(lambda: pool.randint(size), number = number)
+        else:
+            t_pool = timeit.timeit(lambda: pool.roll(size, n), number = number)
+
+        print(f"{f'{n}d{size}':<8} {t_random / number * 1e9:>13,.0f} ns {t_numpy / number * 1e9:>13,.0f} ns {t_pool / number * 1e9:>13,.0f} ns")
+
+if __name__ == "__main__":
+    main()
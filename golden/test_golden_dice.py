@@ -0,0 +1,151 @@
+"""
+Golden output check for the dice engine. Every case in corpus.txt is replayed from a seeded
+RandomPool and the exact messages are compared against dice.golden, so a change to the dice
+internals can be shown to give the same output for the same dice.
+
+Run from the repository root:
+    python golden/test_golden_dice.py            # exits with 1 and prints a diff if any output changed
+    python golden/test_golden_dice.py --record   # rewrites dice.golden after an intended change
+
+Or with pytest:
+    python -m pytest golden
+"""
+import argparse
+import difflib
+import os
+import sys
+import tempfile
+import time
+from os import path
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+from _dice import Engine, Damage
+from _dice.Audit import AuditLog
+from _dice.RandomPool import random_pool
+from _dice.Tokenizer import DiceParseError
+
+CORPUS_PATH = path.join(path.dirname(path.abspath(__file__)), 'corpus.txt')
+GOLDEN_PATH = path.join(path.dirname(path.abspath(__file__)), 'dice.golden')
+SEED = 20210606
+AUDIT_KEY = 0x20210606feedface # Fixed roll key, so audited rolls draw the same streams every run
+CHANNEL = 1234
+
+def audited(inp):
+    """
+    Rolls in a channel with a fresh AuditLog in a temporary directory. The dice come from the
+    roll's Philox stream instead of the RandomPool, and every case is roll id 0.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        key_path = path.join(directory, 'roll_key.txt')
+        with open(key_path, 'w') as file:
+            file.write(f"{AUDIT_KEY:016x}")
+        log = AuditLog(path.join(directory, 'rolls.log'), key_path)
+        saved, Engine.audit_log = Engine.audit_log, log
+        try:
+            return Engine.roll(inp, channel = CHANNEL)
+        finally:
+            Engine.audit_log = saved
+            if log.fd is not None:
+                os.close(log.fd)
+
+def dirty(inp):
+    expression = Engine.dirty_roll(inp)
+    if expression is None:
+        return "(not a roll)"
+    return Engine.roll(expression)
+
+def then(inp):
+    try:
+        return str(Engine.roll_then_count(inp))
+    except DiceParseError as e:
+        return f"DiceParseError: {e.message}"
+
+def single(inp):
+    size, _, modifier = inp.partition(' ')
+    try:
+        return str(Engine.roll_single(int(size), modifier or None))
+    except (DiceParseError, OverflowError, ValueError, TypeError) as e:
+        return type(e).__name__
+
+def dpr(inp):
+    try:
+        request = Damage.parse_request(inp)
+        expression = Damage.damage_expression(request.damage)
+    except DiceParseError as e:
+        return f"DiceParseError: {e.message}"
+    return Damage.dpr(request, expression, expression)
+
+KINDS = {
+    'roll': Engine.roll,
+    'gm': lambda inp: Engine.roll(inp, gm = True),
+    'audited': audited,
+    'total': lambda inp: str(Engine.total(inp)),
+    'dirty': dirty,
+    'then': then,
+    'single': single,
+    'inline': lambda inp: Engine.roll_inline(Engine.inline_spans(inp)) if Engine.inline_spans(inp) else "(no inline rolls)",
+    'odds': Engine.odds,
+    'dpr': dpr,
+}
+
+def load_corpus(filename = CORPUS_PATH):
+    cases = []
+    with open(filename) as file:
+        for line in file:
+            line = line.rstrip('\n')
+            if line.strip() and not line.startswith('#'):
+                kind, _, inp = line.partition(' ')
+                cases.append((kind, inp))
+    return cases
+
+def replay(cases):
+    """
+    Returns the golden text of every case, each rolled from a freshly seeded RandomPool
+    """
+    blocks = []
+    for kind, inp in cases:
+        random_pool.seed(SEED)
+        blocks.append(f"### {kind} {inp}\n{KINDS[kind](inp)}\n")
+    return '\n'.join(blocks)
+
+def diff(golden, output):
+    return ''.join(difflib.unified_diff(golden.splitlines(True), output.splitlines(True), 'dice.golden', 'current'))
+
+def test_golden():
+    """
+    pytest entry point, fails with the diff if any output changed
+    """
+    with open(GOLDEN_PATH) as file:
+        golden = file.read()
+    output = replay(load_corpus())
+    assert output == golden, diff(golden, output)
+
+def main():
+    parser = argparse.ArgumentParser(description = "Checks the dice engine output against the golden file")
+    parser.add_argument('--record', action = 'store_true', help = "rewrite the golden file with the current output")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    cases = load_corpus()
+    output = replay(cases)
+    elapsed = time.perf_counter() - start
+
+    if args.record:
+        with open(GOLDEN_PATH, 'w') as file:
+            file.write(output)
+        print(f"Recorded {len(cases)} cases to {GOLDEN_PATH} in {elapsed:.2f}s")
+        return 0
+
+    with open(GOLDEN_PATH) as file:
+        golden = file.read()
+    if output == golden:
+        print(f"{len(cases)} cases match the golden file ({elapsed:.2f}s)")
+        return 0
+
+    sys.stdout.write(diff(golden, output))
+    print("\nThe output changed, run with --record if the change is intended")
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main())